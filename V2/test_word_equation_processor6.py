@@ -0,0 +1,72 @@
+# test_word_equation_processor6.py
+"""Offline (no Word) equation conversion of word_equation_processor6."""
+
+import json
+import zipfile
+
+import pytest
+
+# The module drives Word through COM at import time
+pytest.importorskip("win32com.client")
+
+import word_equation_processor6 as wep
+
+M_NS = 'xmlns:m="http://schemas.openxmlformats.org/officeDocument/2006/math"'
+W_NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+FRACTION = (f'<m:oMath {M_NS}><m:f><m:fPr/>'
+            '<m:num><m:r><m:t>a</m:t></m:r></m:num>'
+            '<m:den><m:r><m:t>b</m:t></m:r></m:den></m:f></m:oMath>')
+SUPERSCRIPT = (f'<m:oMath {M_NS}><m:sSup><m:sSupPr/>'
+               '<m:e><m:r><m:t>x</m:t></m:r></m:e>'
+               '<m:sup><m:r><m:t>2</m:t></m:r></m:sup></m:sSup></m:oMath>')
+
+
+def test_convert_fraction():
+    assert wep._convert_one(FRACTION) == r'\frac{a}{b}'
+
+
+def test_convert_superscript():
+    assert wep._convert_one(SUPERSCRIPT) == 'x^{2}'
+
+
+def test_process_document_fast(tmp_path):
+    docx_path = tmp_path / 'eq.docx'
+    body = ''.join(f'<w:p><w:r><w:t>eq</w:t></w:r>{math}</w:p>'
+                   for math in (FRACTION, SUPERSCRIPT))
+    with zipfile.ZipFile(docx_path, 'w') as zf:
+        zf.writestr('word/document.xml',
+                    f'<w:document {W_NS}><w:body>{body}</w:body></w:document>')
+
+    replacer = wep.WordEquationReplacer.__new__(wep.WordEquationReplacer)
+    replacer._latex_cache = {}
+    output_path = replacer.process_document_fast(docx_path)
+
+    with zipfile.ZipFile(output_path) as zf:
+        xml = zf.read('word/document.xml').decode('utf-8')
+    assert 'oMath' not in xml
+    assert r'\frac{a}{b}' in xml and 'x^{2}' in xml
+
+    records = json.loads((tmp_path / 'eq_equations.json').read_text(encoding='utf-8'))
+    assert [r['status'] for r in records] == ['replaced_as_text'] * 2
+
+
+def test_insert_bookmarks_keeps_text_after_unterminated_marker(tmp_path):
+    docx_path = tmp_path / 'bm.docx'
+    runs = ''.join(f'<w:r><w:t xml:space="preserve">{text}</w:t></w:r>' for text in (
+        'a \ue000eq_1', '\ue001x+1\ue002 b',  # marker split over two runs
+        ' \ue000eq_2 never closed', ' tail'))
+    with zipfile.ZipFile(docx_path, 'w') as zf:
+        zf.writestr('word/document.xml',
+                    f'<w:document {W_NS}><w:body><w:p>{runs}</w:p></w:body></w:document>')
+
+    replacer = wep.WordEquationReplacer.__new__(wep.WordEquationReplacer)
+    replacer._insert_bookmarks(docx_path)
+
+    with zipfile.ZipFile(docx_path) as zf:
+        root = wep.etree.fromstring(zf.read('word/document.xml'))
+    starts = list(root.iter(wep._W_BOOKMARK_START))
+    assert [s.get(wep._W_NAME) for s in starts] == ['eq_1']
+    assert len(list(root.iter(wep._W_BOOKMARK_END))) == 1
+    text = ''.join(t.text for t in root.iter(wep._W_T))
+    assert text == 'a x+1 b eq_2 never closed tail'
@@ -2,6 +2,7 @@
 """Complete Word COM equation processor - single file solution"""
 
 import win32com.client
+import os
 from pathlib import Path
 import pythoncom
 import json
@@ -236,9 +237,12 @@ def process_folder(input_folder):
     input_path = Path(input_folder)
     processor = WordEquationProcessor()
     
-    docx_files = list(input_path.glob("*.docx"))
-    # Skip temporary files
-    docx_files = [f for f in docx_files if not f.name.startswith('~')]
+    # One scandir pass - skip temporary files. Case-insensitive like the
+    # Windows glob it replaces (.DOCX files count too)
+    with os.scandir(input_path) as it:
+        docx_files = [Path(e.path) for e in it
+                      if e.name.lower().endswith('.docx') and not e.name.startswith('~')
+                      and e.is_file()]
     
     print(f"Found {len(docx_files)} Word documents\n")
     
@@ -4,48 +4,349 @@
 import win32com.client
 from pathlib import Path
 import pythoncom
+import pywintypes
+import hashlib
+import copy
 import json
+import os
 import re
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from lxml import etree
 #from omml_to_latex import omml_xml_to_latex  
 from dwml import omml as dwml_omml
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Control characters
+_CONTROL_CHARS = {'\r': ' ', '\n': ' ', '\t': ' ', '\x07': '', '\x0b': ''}
+
+# Unicode subscripts to LaTeX
+_SUBSCRIPTS = {'₀':'_0', '₁':'_1', '₂':'_2', '₃':'_3', '₄':'_4',
+               '₅':'_5', '₆':'_6', '₇':'_7', '₈':'_8', '₉':'_9',
+               'ₓ':'_x', 'ᵢ':'_i', 'ⱼ':'_j', 'ₙ':'_n'}
+
+# Unicode superscripts to LaTeX
+_SUPERSCRIPTS = {'⁰':'^0', '¹':'^1', '²':'^2', '³':'^3', '⁴':'^4',
+                 '⁵':'^5', '⁶':'^6', '⁷':'^7', '⁸':'^8', '⁹':'^9',
+                 'ⁿ':'^n', 'ⁱ':'^i'}
+
+# Math symbols to LaTeX
+_SYMBOLS = {
+    '≠': '\\neq', '≤': '\\leq', '≥': '\\geq',
+    '∞': '\\infty', '∑': '\\sum', '∏': '\\prod',
+    '∫': '\\int', '√': '\\sqrt', '∂': '\\partial',
+    'α': '\\alpha', 'β': '\\beta', 'γ': '\\gamma',
+    'δ': '\\delta', 'θ': '\\theta', 'π': '\\pi',
+    'σ': '\\sigma', 'μ': '\\mu', 'φ': '\\phi',
+    '→': '\\rightarrow', '←': '\\leftarrow',
+    '⇒': '\\Rightarrow', '⇔': '\\Leftrightarrow',
+    '∈': '\\in', '∉': '\\notin', '⊂': '\\subset',
+    '∪': '\\cup', '∩': '\\cap', '∀': '\\forall',
+    '∃': '\\exists', '±': '\\pm', '×': '\\times',
+    '÷': '\\div', '·': '\\cdot'
+}
+
+# One alternation over every mapped character: a single scan, and unlike
+# str.translate no dict lookup for the characters that don't match
+_CHAR_MAP = {**_CONTROL_CHARS, **_SUBSCRIPTS, **_SUPERSCRIPTS, **_SYMBOLS}
+_CHAR_RE = re.compile('|'.join(re.escape(k) for k in sorted(_CHAR_MAP, key=len, reverse=True)))
+
+# OMML namespace / tags
+_M_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/math'
+_OMATH_TAG = f'{{{_M_NS}}}oMath'
+_OMATHPARA_TAG = f'{{{_M_NS}}}oMathPara'
+_M_R = f'{{{_M_NS}}}r'
+_M_T = f'{{{_M_NS}}}t'
+_M_RPR = f'{{{_M_NS}}}rPr'
+
+# Characters dwml escapes or maps - text without them comes out unchanged
+_LATEX_SPECIAL = frozenset('{}_^#&$%~\\')
+
+# One parser for every document.xml read. Blank text is kept on purpose:
+# <w:t>/<m:t> runs that hold only spaces are real content
+_XML_PARSER = etree.XMLParser(huge_tree=True, collect_ids=False)
+
+# WordprocessingML namespace / tags
+_W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+_W_R = f'{{{_W_NS}}}r'
+_W_T = f'{{{_W_NS}}}t'
+_W_RPR = f'{{{_W_NS}}}rPr'
+_W_ID = f'{{{_W_NS}}}id'
+_W_NAME = f'{{{_W_NS}}}name'
+_W_BOOKMARK_START = f'{{{_W_NS}}}bookmarkStart'
+_W_BOOKMARK_END = f'{{{_W_NS}}}bookmarkEnd'
+_XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+# Markers (private-use code points) written around inserted text and turned
+# into <w:bookmarkStart>/<w:bookmarkEnd> once the document is saved
+_BM_OPEN, _BM_SEP, _BM_CLOSE = '\ue000', '\ue001', '\ue002'
+# An open marker counts only with its separator and a valid bookmark name
+# (no spaces, at most 40 characters); any other marker character is stray
+_BM_MARKER_RE = re.compile('\ue000([^\ue000-\ue002\\s]{1,40})\ue001|[\ue000-\ue002]')
+
+# Pure-ASCII fast path: only control chars can apply
+_CTRL_TABLE = bytes.maketrans(b'\r\n\t', b'   ')
+_CTRL_DELETE = b'\x07\x0b'
+
+_VAR_SUB_RE = re.compile(r'([a-zA-Z])([0-9]+)')
+
+def _char_sub(match, _lookup=_CHAR_MAP.__getitem__):
+    return _lookup(match.group())
+
+def _var_sub(match):
+    # Callable, not r'\1_{\2}': skips re's template expansion per match
+    return f"{match[1]}_{{{match[2]}}}"
+
+# Bound once: the hot path below makes no attribute lookups
+_char_re_sub = _CHAR_RE.sub
+_var_re_sub = _VAR_SUB_RE.sub
+
+@lru_cache(maxsize=None)
+def _clean_to_latex(text):
+    """Convert text to clean LaTeX format (identical strings repeat a lot)"""
+    
+    if not text:
+        return ""
+    
+    if text.isascii():
+        text = text.encode('ascii').translate(_CTRL_TABLE, _CTRL_DELETE).decode('ascii')
+    else:
+        # Control chars, sub/superscripts and symbols in one pass
+        text = _char_re_sub(_char_sub, text)
+    
+    # Pattern fixes
+    text = _var_re_sub(_var_sub, text)  # x1 → x_{1}
+    
+    # Clean spaces
+    return ' '.join(text.split())
+
+def _bookmark_text(name, text):
+    """Wrap text in the markers _insert_bookmarks turns into bookmark `name`"""
+    return f"{_BM_OPEN}{name}{_BM_SEP}{text}{_BM_CLOSE}"
+
+def _run(children, rpr=None):
+    """<w:r> with a copy of run properties `rpr` followed by `children`"""
+    run = etree.Element(_W_R)
+    if rpr is not None:
+        run.append(copy.deepcopy(rpr))
+    run.extend(children)
+    return run
+
+def _text_run(text, rpr=None):
+    """<w:r> holding `text`"""
+    t = etree.Element(_W_T)
+    t.set(_XML_SPACE, 'preserve')
+    t.text = text
+    return _run([t], rpr)
+
+def _next_bookmark_id(root):
+    """First bookmark id not yet used in document `root`"""
+    next_id = 0
+    for start in root.iter(_W_BOOKMARK_START):
+        try:
+            next_id = max(next_id, int(start.get(_W_ID)) + 1)
+        except (TypeError, ValueError):
+            pass
+    return next_id
+
+def _bookmark_start(bookmark_id, name):
+    """<w:bookmarkStart> for bookmark `name`"""
+    start = etree.Element(_W_BOOKMARK_START)
+    start.set(_W_ID, str(bookmark_id))
+    start.set(_W_NAME, name)
+    return start
+
+def _bookmark_end(bookmark_id):
+    """<w:bookmarkEnd> matching _bookmark_start(bookmark_id, ...)"""
+    end = etree.Element(_W_BOOKMARK_END)
+    end.set(_W_ID, str(bookmark_id))
+    return end
+
+def _split_run(run, t, nodes):
+    """Replace <w:t>/<m:t> `t` of `run` by `nodes`.
+    
+    Strings become runs of the same kind (<w:r> or <m:r>) with the original
+    formatting; elements (bookmarks) are placed between those runs.
+    """
+    parent = run.getparent()
+    props = [c for c in run if c.tag in (_W_RPR, _M_RPR)]
+    children = [c for c in run if c.tag not in (_W_RPR, _M_RPR)]
+    k = children.index(t)
+    before, after = children[:k], children[k + 1:]
+    
+    def new_run(kids):
+        piece = etree.Element(run.tag)
+        piece.extend(copy.deepcopy(prop) for prop in props)
+        piece.extend(kids)
+        return piece
+    
+    out = []
+    if before:
+        out.append(new_run(before))
+    for node in nodes:
+        if isinstance(node, str):
+            if node:
+                text = etree.Element(t.tag)
+                text.set(_XML_SPACE, 'preserve')
+                text.text = node
+                out.append(new_run([text]))
+        else:
+            out.append(node)
+    if after:
+        out.append(new_run(after))
+    
+    idx = parent.index(run)
+    parent.remove(run)
+    for offset, node in enumerate(out):
+        parent.insert(idx + offset, node)
+
+def _write_docx(src_path, dst_path, parts):
+    """Copy a .docx, replacing the parts in `parts` (name → bytes)"""
+    dst_path = Path(dst_path)
+    tmp_path = dst_path.with_name(dst_path.name + '.tmp')
+    with zipfile.ZipFile(src_path) as src, \
+         zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for zinfo in src.infolist():
+            if zinfo.filename in parts:
+                dst.writestr(zinfo, parts[zinfo.filename], zipfile.ZIP_DEFLATED)
+            else:
+                dst.writestr(zinfo, src.read(zinfo))
+    tmp_path.replace(dst_path)
+
+def _top_level_omaths(root):
+    """<m:oMath> elements of `root` that are not inside another <m:oMath>"""
+    return [node for node in root.iter(_OMATH_TAG)
+            if next(node.iterancestors(_OMATH_TAG), None) is None]
+
+def _plain_omath_text(node):
+    """
+    LaTeX for an <m:oMath> made only of plain runs (x, n, a+b), without dwml.
+    None when the equation has any structure or text dwml would rewrite.
+    """
+    parts = []
+    for run in node:
+        if run.tag != _M_R:
+            return None
+        for child in run:
+            if child.tag not in (_M_T, _M_RPR, _W_RPR):
+                return None
+        text = run.findtext(_M_T)  # dwml reads the first <m:t> only
+        if text:
+            parts.append(text)
+    text = ''.join(parts)
+    if not text.isascii() or not _LATEX_SPECIAL.isdisjoint(text):
+        return None
+    return text.strip()
+
+def _omml_key(omml_xml):
+    """Cache key for an OMML string"""
+    return hashlib.blake2b(omml_xml.encode('utf-8'), digest_size=16).digest()
+
+def _omml_to_latex(omml_xml):
+    """dwml LaTeX for an <m:oMath> string, or for the <m:oMath> children of its root"""
+    root = ET.fromstring(omml_xml)
+    # dwml's load_string only looks at the children of the root element
+    if root.tag == _OMATH_TAG:
+        return dwml_omml.oMath2Latex(root).latex
+    return ''.join(math.latex for math in dwml_omml.load_string(omml_xml))
+
+def _convert_one(omml_xml):
+    """dwml OMML → LaTeX for one equation; '' if dwml fails (worker-safe)"""
+    try:
+        latex = _omml_to_latex(omml_xml)
+    except Exception:
+        return ''
+    return latex.strip() if latex else ''
+
 class WordEquationReplacer:
     """COMPLETELY REMOVE equation objects, replace with PLAIN TEXT"""
     
+    # Below this many equations a process pool costs more than it saves
+    PARALLEL_MIN_EQUATIONS = 64
+    
+    # Write the equations as JSON Lines (one record per line) instead of
+    # one indented JSON array - better for very large batches
+    JSON_LINES = False
+    
+    # Word.Options switched off while equations are rewritten
+    FAST_MODE_OPTIONS = {
+        'CheckSpellingAsYouType': False,
+        'CheckGrammarAsYouType': False,
+        'Pagination': False,
+        'AutoFormatAsYouTypeReplaceQuotes': False,
+        'AutoFormatAsYouTypeReplaceSymbols': False,
+        'AutoFormatAsYouTypeReplaceOrdinals': False,
+        'AutoFormatAsYouTypeReplaceFractions': False,
+        'AutoFormatAsYouTypeReplaceHyperlinks': False,
+        'AutoFormatAsYouTypeApplyBulletedLists': False,
+        'AutoFormatAsYouTypeApplyNumberedLists': False,
+        'SaveInterval': 0,  # no AutoRecover saves during the bulk edit
+    }
+    
     def __init__(self):
         pythoncom.CoInitialize()
         self.word = None
         self.doc = None
+        self._saved_options = {}
+        self._latex_cache = {}  # OMML hash → LaTeX, shared across documents
         
     def process_document(self, docx_path):
         """Process document - DELETE equations, INSERT plain text"""
         
         docx_path = Path(docx_path).absolute()
         output_path = docx_path.parent / f"{docx_path.stem}_latex_text.docx"
-        json_path = docx_path.parent / f"{docx_path.stem}_equations.json"
+        json_path = self._json_path(docx_path)
         
         print(f"\n📁 Processing: {docx_path.name}")
         
+        # Convert every equation offline, straight from document.xml. Files
+        # that are not a readable .docx package (.doc, encrypted) are left
+        # to Word: the equations are then extracted through COM
         try:
-            # Start Word
+            latex_list = self._read_document_equations(docx_path)
+        except (zipfile.BadZipFile, KeyError) as e:
+            print(f"⚠ Cannot read equations offline ({e}) - extracting through COM")
+            latex_list = None
+        
+        try:
+            # Start Word (early-bound: makepy typelib is generated once and cached)
             print("Starting Word...")
-            self.word = win32com.client.Dispatch("Word.Application")
+            self.word = win32com.client.gencache.EnsureDispatch("Word.Application")
             self.word.Visible = False
+            self._enter_fast_mode()
             
             # Open document
             print("Opening document...")
-            self.doc = self.word.Documents.Open(str(docx_path))
+            self.doc = self.word.Documents.Open(
+                FileName=str(docx_path),
+                ConfirmConversions=False,
+                ReadOnly=False,
+                AddToRecentFiles=False,
+                Revert=False,
+                NoEncodingDialog=True,
+            )
             
             # Replace all equations
-            equations_data = self._replace_all_equations()
+            equations_data = self._replace_all_equations(latex_list)
             
             # Save modified document
             print("Saving document with LaTeX text...")
             self.doc.SaveAs2(str(output_path))
+            self.doc.Close()
+            self.doc = None
+            
+            # Bookmarks go straight into the saved XML in one pass
+            self._insert_bookmarks(output_path)
             
             # Save JSON
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(equations_data, f, indent=2, ensure_ascii=False)
+            self._save_json(json_path, equations_data)
             
             print(f"\n✅ SUCCESS!")
             print(f"   📄 Word with PLAIN TEXT: {output_path}")
@@ -59,75 +360,260 @@ class WordEquationReplacer:
             if self.doc:
                 self.doc.Close()
             if self.word:
+                self._restore_options()
                 self.word.Quit()
             pythoncom.CoUninitialize()
     
-    def _replace_all_equations(self):
+    def process_document_fast(self, docx_path):
+        """Process document WITHOUT Word - rewrite the equations in document.xml"""
+        
+        docx_path = Path(docx_path).absolute()
+        output_path = docx_path.parent / f"{docx_path.stem}_latex_text.docx"
+        json_path = self._json_path(docx_path)
+        
+        print(f"\n📁 Processing (no Word): {docx_path.name}")
+        
+        with zipfile.ZipFile(docx_path) as zf:
+            root = etree.fromstring(zf.read('word/document.xml'), _XML_PARSER)
+        
+        omaths = _top_level_omaths(root)
+        latex_list = self._convert_omml_nodes(omaths)
+        
+        print(f"Found {len(omaths)} equations to replace")
+        
+        equations_data = []
+        math_paras = []
+        next_id = _next_bookmark_id(root)
+        
+        for i, (node, latex_text) in enumerate(zip(omaths, latex_list), 1):
+            status = 'replaced_as_text'
+            if not latex_text:
+                # dwml failed - keep the equation's own text
+                latex_text = self._clean_to_latex(''.join(node.itertext())) or "[equation]"
+                status = 'text_fallback'
+            
+            bookmark_name = f"eq_{i}"
+            replacement = [
+                _bookmark_start(next_id, bookmark_name),
+                _text_run(f" {latex_text} "),
+                _bookmark_end(next_id),
+            ]
+            next_id += 1
+            
+            # Runs can't live inside <m:oMathPara>: put them before it
+            anchor = node
+            parent = node.getparent()
+            if parent.tag == _OMATHPARA_TAG:
+                anchor = parent
+                if not math_paras or math_paras[-1] is not parent:
+                    math_paras.append(parent)
+            for element in replacement:
+                anchor.addprevious(element)
+            parent.remove(node)
+            
+            equations_data.append({
+                'index': i,
+                'latex': latex_text,
+                'bookmark': bookmark_name,
+                'status': status
+            })
+        
+        for math_para in math_paras:
+            math_para.getparent().remove(math_para)
+        
+        xml = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+        _write_docx(docx_path, output_path, {'word/document.xml': xml})
+        self._save_json(json_path, equations_data)
+        
+        print("\n✅ SUCCESS!")
+        print(f"   📄 Word with PLAIN TEXT: {output_path}")
+        print(f"   📋 Equations JSON: {json_path}")
+        print(f"   ✓ Replaced {len(equations_data)} equations with PLAIN TEXT")
+        
+        return output_path
+    
+    def _enter_fast_mode(self):
+        """Stop Word's background work (redraw, proofing, pagination, autoformat)"""
+        
+        self.word.ScreenUpdating = False
+        self.word.DisplayAlerts = 0  # wdAlertsNone
+        
+        options = self.word.Options
+        self._saved_options = {}
+        for name, value in self.FAST_MODE_OPTIONS.items():
+            try:
+                self._saved_options[name] = getattr(options, name)
+                setattr(options, name, value)
+            except Exception:
+                pass
+    
+    def _restore_options(self):
+        """Put back the Word.Options changed by _enter_fast_mode"""
+        
+        options = self.word.Options
+        for name, value in self._saved_options.items():
+            try:
+                setattr(options, name, value)
+            except Exception:
+                pass
+        self._saved_options = {}
+    
+    def _json_path(self, docx_path):
+        """Where the equations JSON for `docx_path` goes"""
+        suffix = 'jsonl' if self.JSON_LINES else 'json'
+        return docx_path.parent / f"{docx_path.stem}_equations.{suffix}"
+    
+    def _save_json(self, json_path, equations_data):
+        """Write equations JSON - orjson when available, stdlib json otherwise"""
+        
+        if self.JSON_LINES:
+            with open(json_path, 'wb') as f:
+                for record in equations_data:
+                    if orjson is not None:
+                        f.write(orjson.dumps(record))
+                    else:
+                        f.write(json.dumps(record, ensure_ascii=False).encode('utf-8'))
+                    f.write(b'\n')
+        elif orjson is not None:
+            Path(json_path).write_bytes(orjson.dumps(
+                equations_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(equations_data, f, indent=2, ensure_ascii=False)
+    
+    def _read_document_equations(self, docx_path):
+        """Convert the <m:oMath> nodes of word/document.xml to LaTeX in one parse
+        
+        Nested equations are skipped, as in process_document_fast: each
+        top-level equation converts with its nested ones included.
+        """
+        
+        with zipfile.ZipFile(docx_path) as zf:
+            with zf.open('word/document.xml') as f:
+                tree = etree.parse(f, _XML_PARSER)
+        
+        return self._convert_omml_nodes(_top_level_omaths(tree.getroot()))
+    
+    def _convert_omml_nodes(self, nodes):
+        """LaTeX for each <m:oMath> element ('' where dwml fails)"""
+        
+        latex_list = []
+        keys = []  # (position, key) of the equations dwml has to convert
+        pending = {}  # key → OMML, each distinct equation converted once
+        for node in nodes:
+            # Most equations are a single symbol/run: skip serialising + dwml
+            plain = _plain_omath_text(node)
+            if plain is not None:
+                latex_list.append(plain)
+                continue
+            omml_xml = etree.tostring(node, encoding='unicode')
+            key = _omml_key(omml_xml)
+            keys.append((len(latex_list), key))
+            latex_list.append(None)
+            if key not in self._latex_cache:
+                pending[key] = omml_xml
+        
+        # dwml is pure-Python CPU work - spread it over all cores (Windows
+        # allows at most 61 pool workers)
+        if len(pending) >= self.PARALLEL_MIN_EQUATIONS:
+            with ProcessPoolExecutor(max_workers=min(61, os.cpu_count() or 1)) as ex:
+                results = ex.map(_convert_one, pending.values(), chunksize=16)
+                self._latex_cache.update(zip(pending, results))
+        else:
+            for key, omml_xml in pending.items():
+                self._latex_cache[key] = _convert_one(omml_xml)
+        
+        for pos, key in keys:
+            latex_list[pos] = self._latex_cache[key]
+        return latex_list
+    
+    def _replace_all_equations(self, latex_list=None):
         """DELETE equation objects and INSERT plain text"""
         
         equations_data = []
-        total = self.doc.OMaths.Count
+        
+        # Enumerate the collection once; Range objects track their own position
+        # as later equations are rewritten, so no OMaths.Item(i) per equation
+        equations = [(omath, omath.Range) for omath in self.doc.OMaths]
+        total = len(equations)
         
         print(f"Found {total} equation OBJECTS to remove")
         
-        # Process from last to first
-        for i in range(total, 0, -1):
-            try:
-                omath = self.doc.OMaths.Item(i)
-                
-                # Extract LaTeX text FIRST
-                latex_text = self._extract_latex(omath)
-                
-                # Get the range of the equation
-                eq_range = omath.Range
-                
-                # METHOD 1: Delete equation and insert text
-                eq_range.Select()
-                selection = self.word.Selection
-                
-                # DELETE the equation completely
-                selection.Delete()
-                
-                # INSERT plain text (NOT an equation)
-                selection.TypeText(f" {latex_text} ")
-                
-                # Format the PLAIN TEXT
-                #selection.Font.Name = "Courier New"
-                #selection.Font.Bold = False
-                #selection.Font.Color = 0x0000FF  # Blue
-                #selection.Shading.BackgroundPatternColor = 0xFFFF00  # Yellow
-                
-                # Add bookmark
+        # Offline LaTeX lines up with OMaths only if both see the same equations
+        if latex_list is not None and len(latex_list) != total:
+            print(f"⚠ document.xml has {len(latex_list)} equations, Word has {total}"
+                  " - extracting through COM instead")
+            latex_list = None
+        
+        # No revision marks or undo records for the bulk edit; the user's
+        # setting goes back before the document is saved
+        track_revisions = self.doc.TrackRevisions
+        self.doc.TrackRevisions = False
+        try:
+            self.doc.UndoClear()
+            
+            # Per-equation lines are written once after the loop: one console
+            # write instead of one (synchronous on Windows) per equation
+            log_lines = []
+            
+            # Process from last to first
+            for i in range(total, 0, -1):
+                omath, eq_range = equations[i - 1]
+            
+                # Extract LaTeX text FIRST (COM only if the offline pass failed)
+                latex_text = latex_list[i - 1] if latex_list else ''
+                if not latex_text:
+                    latex_text = self._extract_latex(omath, eq_range)
+            
+                # Overwrite the equation with PLAIN TEXT in one COM call
+                # (no Selection, so no selection events / autoformat).
+                # The markers become a bookmark after SaveAs2
                 bookmark_name = f"eq_{i}"
                 try:
-                    self.doc.Bookmarks.Add(bookmark_name, selection.Range)
-                except:
-                    pass
+                    eq_range.Text = f" {_bookmark_text(bookmark_name, latex_text)} "
+                except pywintypes.com_error as e:
+                    log_lines.append(f"  ⚠ Equation {i} failed: {str(e)[:50]}")
                 
+                    # Try alternative method
+                    try:
+                        latex_text = self._force_delete_and_replace(omath, eq_range)
+                        equations_data.append({
+                            'index': i,
+                            'latex': latex_text,
+                            'bookmark': bookmark_name,
+                            'status': 'force_replaced'
+                        })
+                        log_lines.append(f"    → Force replaced with text: {latex_text[:30]}...")
+                    except pywintypes.com_error as e2:
+                        log_lines.append(f"    → Could not replace: {e2}")
+                    continue
+            
+                # Writing Range.Text can leave the math zone in place around
+                # the new text - force it out, the marker text stays behind
+                status = 'replaced_as_text'
+                try:
+                    if eq_range.OMaths.Count:
+                        log_lines.append(f"  ⚠ Equation {i} survived the text write")
+                        self._force_delete_and_replace(eq_range.OMaths(1), eq_range)
+                        status = 'force_replaced'
+                except pywintypes.com_error as e:
+                    log_lines.append(f"    → Could not replace: {e}")
+                    continue
+            
                 equations_data.append({
                     'index': i,
                     'latex': latex_text,
                     'bookmark': bookmark_name,
-                    'status': 'replaced_as_text'
+                    'status': status
                 })
-                
-                print(f"  ✓ Removed equation {i}, inserted text: {latex_text[:50]}...")
-                
-            except Exception as e:
-                print(f"  ⚠ Equation {i} failed: {str(e)[:50]}")
-                
-                # Try alternative method
-                try:
-                    latex_text = self._force_delete_and_replace(i)
-                    equations_data.append({
-                        'index': i,
-                        'latex': latex_text,
-                        'bookmark': f"eq_{i}",
-                        'status': 'force_replaced'
-                    })
-                    print(f"    → Force replaced with text: {latex_text[:30]}...")
-                except Exception as e2:
-                    print(f"    → Could not replace: {e2}")
+            
+                log_lines.append(f"  ✓ Removed equation {i}, inserted text: {latex_text[:50]}...")
+        finally:
+            self.doc.TrackRevisions = track_revisions
+        
+        if log_lines:
+            sys.stdout.write('\n'.join(log_lines) + '\n')
+            sys.stdout.flush()
         
         # Verify no equations remain
         remaining = self.doc.OMaths.Count
@@ -138,15 +624,81 @@ class WordEquationReplacer:
         
         return equations_data
     
-    def _force_delete_and_replace(self, index):
-        """Force delete equation and replace with text"""
+    def _insert_bookmarks(self, docx_path):
+        """Turn the bookmark markers of a saved document into real bookmarks"""
+        
+        with zipfile.ZipFile(docx_path) as zf:
+            root = etree.fromstring(zf.read('word/document.xml'), _XML_PARSER)
+        
+        # Continue after the ids already used in the document
+        next_id = _next_bookmark_id(root)
         
-        omath = self.doc.OMaths.Item(index)
+        # Word may split the marker text over several runs, plain or math:
+        # match the markers over the text of every <w:t>/<m:t> joined up,
+        # then cut each run at the markers that fall in it
+        texts = [t for t in root.iter(_W_T, _M_T) if t.text]
+        full = ''.join([t.text for t in texts])
+        
+        edits = []  # (start, end, bookmark element or None), in text order
+        open_starts = []
+        dropped = []
+        for m in _BM_MARKER_RE.finditer(full):
+            element = None
+            if m.group(1) is not None:
+                element = _bookmark_start(next_id, m.group(1))
+                next_id += 1
+                open_starts.append(element)
+            elif m.group() == _BM_CLOSE and open_starts:
+                element = _bookmark_end(open_starts.pop().get(_W_ID))
+            else:
+                # Stray marker character - only the character goes
+                dropped.append({_BM_OPEN: 'start', _BM_SEP: 'separator',
+                                _BM_CLOSE: 'end'}[m.group()])
+            edits.append((m.start(), m.end(), element))
+        
+        # A start whose end marker was lost would leave a dangling bookmark
+        unclosed = set(open_starts)
+        dropped.extend(f"start of {start.get(_W_NAME)!r}" for start in open_starts)
+        
+        k = 0
+        offset = 0
+        for t in texts:
+            text = t.text
+            a, b = offset, offset + len(text)
+            offset = b
+            while k < len(edits) and edits[k][1] <= a:
+                k += 1
+            if k == len(edits) or edits[k][0] >= b:
+                continue
+            
+            nodes = []
+            cut = a
+            for start, end, element in edits[k:]:
+                if start >= b:
+                    break
+                nodes.append(text[cut - a:max(start, a) - a])
+                if start >= a and element is not None and element not in unclosed:
+                    nodes.append(element)
+                cut = min(end, b)
+            nodes.append(text[cut - a:])
+            
+            _split_run(t.getparent(), t, nodes)
+        
+        if dropped:
+            print(f"⚠ {len(dropped)} bookmark marker(s) dropped: {', '.join(dropped[:5])}")
+        
+        if edits:
+            xml = etree.tostring(root, xml_declaration=True,
+                                 encoding='UTF-8', standalone=True)
+            _write_docx(docx_path, docx_path, {'word/document.xml': xml})
+    
+    def _force_delete_and_replace(self, omath, eq_range):
+        """Force delete equation and replace with text"""
         
         # Get text first
         latex_text = "[equation]"
         try:
-            latex_text = omath.Range.Text or "[equation]"
+            latex_text = eq_range.Text or "[equation]"
         except:
             pass
         
@@ -156,22 +708,16 @@ class WordEquationReplacer:
         try:
             omath.ConvertToNormalText()
         except:
-            # If that fails, select and delete
-            omath.Range.Select()
-            self.word.Selection.Delete()
-            self.word.Selection.TypeText(f" {latex_text} ")
-        
-        # Format
-        omath.Range.Font.Name = "Courier New"
-        #omath.Range.Font.Color = 0xFF0000
-        #omath.Range.Shading.BackgroundPatternColor = 0xFFFF00
+            # If that fails, delete and insert on the Range (no Selection)
+            eq_range.Delete()
+            eq_range.InsertAfter(f" {latex_text} ")
         
         return latex_text
 
 
 
 
-    def _extract_latex(self, omath):
+    def _extract_latex(self, omath, eq_range=None):
         """
         Convert a Word OMath object to LaTeX.
 
@@ -193,27 +739,40 @@ class WordEquationReplacer:
                     'officeDocument/2006/math">' + omml_xml + '</m:oMath>'
                 )
 
-            latex = dwml_omml.xml2latex(omml_xml)
+            key = _omml_key(omml_xml)
+            cached = self._latex_cache.get(key)
+            if cached:
+                return cached
+
+            latex = _omml_to_latex(omml_xml)
 
             if latex and latex.strip():
+                self._latex_cache[key] = latex.strip()
                 return latex.strip()                  # success!
-            else:
-                self.logger.debug("dwml returned empty string")
+            # dwml returned an empty string - fall back
 
-        except Exception as e:
-            # dwml couldn’t parse – log & fall back
-            self.logger.debug(f"dwml failed: {e}")
+        except Exception:
+            pass  # dwml couldn’t parse – fall back
 
         # -- STEP 2 : Word’s own linear text ------------------------------
+        # One property read per equation, and only for the few dwml cannot
+        # convert. No batch Range.Text read: the document text carries no
+        # equation boundaries, and Range.Text gives the built-up glyphs
+        # rather than the linear form anyway
         try:
             linear = omath.LinearString
             if linear and linear.strip():
                 return self._clean_to_latex(linear)
-        except Exception:
+        except pywintypes.com_error:
             pass  # ignore, drop to final placeholder
 
         # -- STEP 3 : last-resort placeholder -----------------------------
-        return f"[equation_{omath.Range.Start}]"
+        try:
+            if eq_range is None:
+                eq_range = omath.Range
+            return f"[equation_{eq_range.Start}]"
+        except pywintypes.com_error:
+            return "[equation]"
 
 
     def _extract_latex_old4(self, omath):
@@ -364,53 +923,7 @@ class WordEquationReplacer:
 
     def _clean_to_latex(self, text):
         """Convert text to clean LaTeX format"""
-        
-        if not text:
-            return ""
-        
-        # Remove control characters
-        text = text.replace('\r', ' ').replace('\n', ' ').replace('\x07', '')
-        text = text.replace('\x0b', '').replace('\t', ' ')
-        
-        # Unicode subscripts to LaTeX
-        subs = {'₀':'_0', '₁':'_1', '₂':'_2', '₃':'_3', '₄':'_4',
-                '₅':'_5', '₆':'_6', '₇':'_7', '₈':'_8', '₉':'_9',
-                'ₓ':'_x', 'ᵢ':'_i', 'ⱼ':'_j', 'ₙ':'_n'}
-        for u, l in subs.items():
-            text = text.replace(u, l)
-        
-        # Unicode superscripts to LaTeX
-        sups = {'⁰':'^0', '¹':'^1', '²':'^2', '³':'^3', '⁴':'^4',
-                '⁵':'^5', '⁶':'^6', '⁷':'^7', '⁸':'^8', '⁹':'^9',
-                'ⁿ':'^n', 'ⁱ':'^i'}
-        for u, l in sups.items():
-            text = text.replace(u, l)
-        
-        # Math symbols to LaTeX
-        symbols = {
-            '≠': '\\neq', '≤': '\\leq', '≥': '\\geq',
-            '∞': '\\infty', '∑': '\\sum', '∏': '\\prod',
-            '∫': '\\int', '√': '\\sqrt', '∂': '\\partial',
-            'α': '\\alpha', 'β': '\\beta', 'γ': '\\gamma',
-            'δ': '\\delta', 'θ': '\\theta', 'π': '\\pi',
-            'σ': '\\sigma', 'μ': '\\mu', 'φ': '\\phi',
-            '→': '\\rightarrow', '←': '\\leftarrow',
-            '⇒': '\\Rightarrow', '⇔': '\\Leftrightarrow',
-            '∈': '\\in', '∉': '\\notin', '⊂': '\\subset',
-            '∪': '\\cup', '∩': '\\cap', '∀': '\\forall',
-            '∃': '\\exists', '±': '\\pm', '×': '\\times',
-            '÷': '\\div', '·': '\\cdot'
-        }
-        for symbol, latex in symbols.items():
-            text = text.replace(symbol, latex)
-        
-        # Pattern fixes
-        text = re.sub(r'([a-zA-Z])([0-9]+)', r'\1_{\2}', text)  # x1 → x_{1}
-        
-        # Clean spaces
-        text = ' '.join(text.split())
-        
-        return text.strip()
+        return _clean_to_latex(text)
 
 # ============= Test it =============
 if __name__ == "__main__":
@@ -4,10 +4,20 @@ Properly handles matrices, integrals, binomials, symbols with spacing
 """
 
 import os
+import sys
 import zipfile
-import re
+try:
+    import regex as re
+except ImportError:
+    import re
+from functools import lru_cache
 from lxml import etree
 
+# Atomic groups / possessive quantifiers keep the repeat patterns below from
+# backtracking into brace bodies. Supported by the regex module and by
+# stdlib re from Python 3.11; older stdlib re gets the plain forms
+_ATOMIC = re.__name__ == 'regex' or sys.version_info >= (3, 11)
+
 # Symbol mapping
 MATH_SYMBOLS = {
     '≠': r'\neq', '≤': r'\leq', '≥': r'\geq', '±': r'\pm', '×': r'\times',
@@ -36,70 +46,207 @@ FUNCTION_NAMES = {
     'min': r'\min', 'max': r'\max', 'det': r'\det', 'dim': r'\dim',
 }
 
+# All symbols in one alternation (longest first, so multi-char keys win)
+_SYMBOL_RE = re.compile('|'.join(
+    re.escape(s) for s in sorted(MATH_SYMBOLS, key=len, reverse=True)))
+
+def _symbol_sub(m):
+    latex = MATH_SYMBOLS[m.group()]
+    # General rule: LaTeX commands need space before letters
+    end = m.end()
+    text = m.string
+    if latex.startswith('\\') and end < len(text) and text[end].isalpha():
+        return latex + ' '
+    return latex
+
+# Any function name as a word, followed by space, '(' or the end. Once the
+# longest name has matched, a shorter one can only end before a letter, so
+# the alternation is committed atomically
+_FUNC_ALT = '|'.join(re.escape(f) for f in sorted(FUNCTION_NAMES, key=len, reverse=True))
+_FUNC_RE = re.compile((r'\b(?>(' if _ATOMIC else r'\b((') + _FUNC_ALT + r'))(?=\s|\(|$)')
+
+def _func_sub(m):
+    return FUNCTION_NAMES[m.group(1)]
+
+# Clark-notation tags for direct child lookups
+_M_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/math'
+_M_VAL = f'{{{_M_NS}}}val'
+_M_E = f'{{{_M_NS}}}e'
+_M_T = f'{{{_M_NS}}}t'
+_M_M = f'{{{_M_NS}}}m'
+_M_MR = f'{{{_M_NS}}}mr'
+_M_D = f'{{{_M_NS}}}d'
+_M_EQARR = f'{{{_M_NS}}}eqArr'
+_M_DPR = f'{{{_M_NS}}}dPr'
+_M_BEG_CHR = f'{{{_M_NS}}}begChr'
+_M_END_CHR = f'{{{_M_NS}}}endChr'
+
+# Patterns used on every run / equation, compiled once
+# parse_r
+# 'rⅆrⅆ' / 'xⅆ' differentials in one pass. An ⅆ right after a double
+# match follows the 'd' just written, so it becomes a differential too
+_RE_DIFF = re.compile(r'([a-z])ⅆ(?:([a-z])ⅆ(ⅆ)?)?')
+# Plain 'd' differentials: 'rdrd' and 'xdα'
+_RE_D = re.compile(r'([a-z])d(?:([a-z])d\b|([αβγδεζηθικλμνξοπρστυφχψω]))')
+_RE_GREEK_VAR = re.compile(r'(\\gamma|\\alpha|\\beta|\\delta|\\theta|\\sigma)([a-z])')
+# clean_output
+_RE_SINGLE_BRACE = re.compile(r'(?<!\\[a-zA-Z])\{([a-zA-Z0-9])\}')
+_RE_DOUBLE_BRACE = re.compile(r'\{\{([^}]++)\}\}' if _ATOMIC else r'\{\{([^}]+)\}\}')
+_RE_WS_UNDER = re.compile(r'\s+_')
+_RE_WS_CARET = re.compile(r'\s+\^')
+_RE_PARTIAL = re.compile(r'(\\partial)([a-zA-Z])')
+_RE_FRAC_FIX = re.compile(r'\\frac([a-zA-Z0-9])\{')
+# Structures clean_output only touches minimally
+_RE_STRUCTURAL = re.compile(r'\\(?:binom|left|right|begin)')
+# Every clean_output pattern needs one of these characters
+_RE_CLEANABLE = re.compile(r'[{_^\\]')
+# apply_post_processing
+_RE_BINOM_BARE = re.compile(r'\\binom([a-zA-Z])([a-zA-Z])')
+# [a-z]+ and [^)]+ stay backtracking: a shorter repeat or the '\right)'
+# boundary can depend on giving characters back
+if _ATOMIC:
+    _RE_EXP_REPEAT = re.compile(r'(e\^\{[^}]++\}[a-z]+)(.*?)\1')
+    _RE_LIM_REPEAT = re.compile(r'(\\lim[^}]*+})\s*\\lim\s')
+    _RE_BINOM_PAREN = re.compile(r'\\left\(\\binom\{([^}]++)\}\{([^}]++)\}\\right\)')
+else:
+    _RE_EXP_REPEAT = re.compile(r'(e\^{[^}]+}[a-z]+)(.*?)\1')
+    _RE_LIM_REPEAT = re.compile(r'(\\lim[^}]*})\s*\\lim\s')
+    _RE_BINOM_PAREN = re.compile(r'\\left\(\\binom\{([^}]+)\}\{([^}]+)\}\\right\)')
+_RE_FUNC_REPEAT = re.compile(r'([a-zA-Z]+)\\left\(([^)]+)\\right\)\1')
+# Every "command needs a space before what follows" fix in one pass
+_RE_POST_SPACE = re.compile(
+    r'\\(?:partial|upsilon|gamma|exists|forall|cdot)(?=[a-zA-Z])'
+    r'|\\rightarrow(?=[A-Z][a-z])'
+    r'|\\(?:approx|equiv|sim)(?=\d)')
+
+def _post_space(m):
+    return m.group() + ' '
+
+def _diff_sub(m):
+    x, y, extra = m.groups()
+    if y is None:
+        return f'{x} \\, d'
+    if extra is None:
+        return f'{x} \\, d{y} \\, d'
+    return f'{x} \\, d{y} \\, d \\, d'
+
+def _d_sub(m):
+    x, y, greek = m.groups()
+    if greek is None:
+        return f'{x} \\, d{y} \\, d'
+    return f'{x} \\, d{greek}'
+
+def _smart_symbol_convert(text):
+    # Every MATH_SYMBOLS key is a non-ASCII code point
+    if text.isascii():
+        return text
+    return _SYMBOL_RE.sub(_symbol_sub, text)
+
+def _convert_function_names(text):
+    if text.startswith('\\'):
+        return text
+    return _FUNC_RE.sub(_func_sub, text)
+
+@lru_cache(maxsize=8192)
+def _process_run_text(text):
+    """LaTeX for the text of one <m:r> (x, +, ⅆx, sin ... repeat a lot)"""
+    # Handle minus sign first
+    text = text.replace('−', '-')
+    
+    # FIX: Handle differential d (ⅆ) with proper LaTeX spacing
+    # 'rⅆrⅆ' -> 'r \, dr \, d', 'xⅆ' -> 'x \, d'
+    if 'ⅆ' in text:
+        text = _RE_DIFF.sub(_diff_sub, text)
+    
+    # Also handle regular 'd' as differential when it follows a variable
+    # This catches cases where 'd' is already regular 'd' not 'ⅆ'
+    if 'd' in text:
+        text = _RE_D.sub(_d_sub, text)
+    
+    # Convert symbols with smart spacing
+    text = _smart_symbol_convert(text)
+    
+    # FIX: Add space after Greek letters when followed by variables
+    # This fixes γz → \gamma z in superscripts
+    text = _RE_GREEK_VAR.sub(r'\1 \2', text)
+
+    # Convert function names
+    text = _convert_function_names(text)
+    
+    return text
+
+def _has_structural(latex):
+    """\\binom / \\left / \\right / \\begin present (one scan)"""
+    return _RE_STRUCTURAL.search(latex) is not None
+
+def _first(nodes):
+    """First XPath result or None, like Element.find"""
+    return nodes[0] if nodes else None
+
 class DirectOmmlToLatex:
     def __init__(self):
         self.ns = {
             'm': 'http://schemas.openxmlformats.org/officeDocument/2006/math',
             'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
         }
+        
+        # Compiled once and reused on every element
+        def xp(path):
+            return etree.XPath(path, namespaces=self.ns)
+        self._xp_num = xp('.//m:num')
+        self._xp_den = xp('.//m:den')
+        self._xp_e = xp('m:e')
+        self._xp_sub = xp('m:sub')
+        self._xp_sup = xp('m:sup')
+        self._xp_lim = xp('m:lim')
+        self._xp_deg = xp('m:deg')
+        self._xp_fname = xp('m:fName')
+        self._xp_nary_chr = xp('.//m:naryPr/m:chr')
+        self._xp_acc_chr = xp('.//m:accPr/m:chr')
+        self._xp_deg_hide = xp('.//m:degHide')
+        self._xp_lim_low = xp('.//m:limLow')
+        
+        # Local tag name → bound parse_* method, built once
+        self._dispatch = {name[6:]: getattr(self, name) for name in dir(self)
+                          if name.startswith('parse_') and name != 'parse_default'}
+        self._dispatch_get = self._dispatch.get
+        self._default = self.parse_default
             
     def smart_symbol_convert(self, text):
         """Convert symbols with smart spacing"""
-        result = []
-        i = 0
-        while i < len(text):
-            found = False
-            for symbol, latex in MATH_SYMBOLS.items():
-                if text[i:i+len(symbol)] == symbol:
-                    result.append(latex)
-                    # General rule: LaTeX commands need space before letters
-                    if i + len(symbol) < len(text):
-                        next_char = text[i + len(symbol)]
-                        # If it's a LaTeX command and next is letter, add space
-                        if latex.startswith('\\') and next_char.isalpha():
-                            result.append(' ')
-                    i += len(symbol)
-                    found = True
-                    break
-            if not found:
-                result.append(text[i])
-                i += 1
-        return ''.join(result)
-
-
+        return _smart_symbol_convert(text)
     
     def convert_function_names(self, text):
         """Convert function names to LaTeX"""
-        if text.startswith('\\'):
-            return text
-        for func, latex_func in FUNCTION_NAMES.items():
-            text = re.sub(r'\b' + re.escape(func) + r'(?=\s|\(|$)', 
-                         lambda m: latex_func, text)
-        return text
+        return _convert_function_names(text)
     
     def clean_output(self, latex):
         """Clean LaTeX output carefully"""
+        # Plain bases (x, 2n, ...) are left as they are - skip the passes
+        if not _RE_CLEANABLE.search(latex):
+            return latex
+        
         # Skip cleaning for certain patterns
-        if any(cmd in latex for cmd in ['\\binom', '\\left', '\\right', '\\begin']):
+        if _has_structural(latex):
             # Only do minimal cleaning for complex structures
-            latex = re.sub(r'\s+_', '_', latex)
-            latex = re.sub(r'\s+\^', '^', latex)
+            latex = _RE_WS_UNDER.sub('_', latex)
+            latex = _RE_WS_CARET.sub('^', latex)
             # Fix partial derivatives
-            latex = re.sub(r'(\\partial)([a-zA-Z])', r'\1 \2', latex)
+            latex = _RE_PARTIAL.sub(r'\1 \2', latex)
             # Fix missing braces in fractions
-            latex = re.sub(r'\\frac([a-zA-Z0-9])\{', r'\\frac{\1}{', latex)
+            latex = _RE_FRAC_FIX.sub(r'\\frac{\1}{', latex)
             return latex
             
         # Regular cleaning for simple content
         # Don't remove braces from single characters after backslash commands
-        latex = re.sub(r'(?<!\\[a-zA-Z])\{([a-zA-Z0-9])\}', r'\1', latex)
-        latex = re.sub(r'\{\{([^}]+)\}\}', r'{\1}', latex)
-        latex = re.sub(r'\s+_', '_', latex)
-        latex = re.sub(r'\s+\^', '^', latex)
+        latex = _RE_SINGLE_BRACE.sub(r'\1', latex)
+        latex = _RE_DOUBLE_BRACE.sub(r'{\1}', latex)
+        latex = _RE_WS_UNDER.sub('_', latex)
+        latex = _RE_WS_CARET.sub('^', latex)
         # Fix partial derivatives
-        latex = re.sub(r'(\\partial)([a-zA-Z])', r'\1 \2', latex)
+        latex = _RE_PARTIAL.sub(r'\1 \2', latex)
         # Fix missing braces in fractions
-        latex = re.sub(r'\\frac([a-zA-Z0-9])\{', r'\\frac{\1}{', latex)
+        latex = _RE_FRAC_FIX.sub(r'\\frac{\1}{', latex)
         return latex
     
     def parse(self, elem):
@@ -107,57 +254,30 @@ class DirectOmmlToLatex:
         if elem is None:
             return ''
         
-        tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-        handler = getattr(self, f'parse_{tag}', self.parse_default)
-        return handler(elem)
+        tag = elem.tag
+        return self._dispatch_get(tag[tag.rfind('}') + 1:], self._default)(elem)
     
     def parse_oMath(self, elem):
-        latex = ''.join(self.parse(child) for child in elem)
+        parse = self.parse
+        latex = ''.join([parse(child) for child in elem])
         latex = self.clean_output(latex)
         latex = self.apply_post_processing(latex)
         return latex
     
     def parse_oMathPara(self, elem):
-        return ''.join(self.parse(child) for child in elem)
+        parse = self.parse
+        return ''.join([parse(child) for child in elem])
 
     def parse_r(self, elem):
         """Run element with smart symbol handling"""
-        texts = elem.xpath('.//m:t/text()', namespaces=self.ns)
-        text = ''.join(texts)
-        
-        # Handle minus sign first
-        text = text.replace('−', '-')
-        
-        # FIX: Handle differential d (ⅆ) with proper LaTeX spacing
-        # Pattern 'rⅆrⅆ' should become 'r \, dr \, d'
-        text = re.sub(r'([a-z])ⅆ([a-z])ⅆ', r'\1 \, d\2 \, d', text)
-
-        
-        # Handle single differential like 'xⅆ' -> 'x \, d'
-        text = re.sub(r'([a-z])ⅆ', r'\1 \, d', text)
-        
-        # Also handle regular 'd' as differential when it follows a variable
-        # This catches cases where 'd' is already regular 'd' not 'ⅆ'
-        text = re.sub(r'([a-z])d([a-z])d\b', r'\1 \, d\2 \, d', text)
-        text = re.sub(r'([a-z])d([αβγδεζηθικλμνξοπρστυφχψω])', r'\1 \, d\2', text)
-        
-        # Convert symbols with smart spacing
-        text = self.smart_symbol_convert(text)
-        
-        # FIX: Add space after Greek letters when followed by variables
-        # This fixes γz → \gamma z in superscripts
-        text = re.sub(r'(\\gamma|\\alpha|\\beta|\\delta|\\theta|\\sigma)([a-z])', r'\1 \2', text)
-
-        # Convert function names
-        text = self.convert_function_names(text)
-        
-        return text
+        text = ''.join([t.text for t in elem.iter(_M_T) if t.text])
+        return _process_run_text(text)
 
 
     def parse_f(self, elem):
         """Fraction with proper binomial detection"""
-        num_elem = elem.find('.//m:num', self.ns)
-        den_elem = elem.find('.//m:den', self.ns)
+        num_elem = _first(self._xp_num(elem))
+        den_elem = _first(self._xp_den(elem))
         
         num = self.parse(num_elem) if num_elem is not None else ''
         den = self.parse(den_elem) if den_elem is not None else ''
@@ -178,7 +298,7 @@ class DirectOmmlToLatex:
             num.isalpha() and den.isalpha() and
             ((num == 'n' and den == 'k') or 
             (elem.getparent() is not None and 
-            elem.getparent().tag.endswith('d')))):  # Check if inside delimiters
+            elem.getparent().tag == _M_D))):  # Check if inside delimiters
             return f'\\binom{{{num}}}{{{den}}}'
         
         # Regular fraction - ensure braces are always present
@@ -186,8 +306,8 @@ class DirectOmmlToLatex:
     
     def parse_sSup(self, elem):
         """Superscript - handle complex nested structures"""
-        base_elem = elem.find('m:e', self.ns)
-        sup_elem = elem.find('m:sup', self.ns)
+        base_elem = _first(self._xp_e(elem))
+        sup_elem = _first(self._xp_sup(elem))
         
         base = self.parse(base_elem) if base_elem is not None else ''
         sup = self.parse(sup_elem) if sup_elem is not None else ''
@@ -205,15 +325,15 @@ class DirectOmmlToLatex:
                     base = '\\left[' + '\\int'.join(parts[:3]) + '\\right]'
         
         # Clean the base for simple cases
-        if not any(cmd in base for cmd in ['\\binom', '\\left', '\\right', '\\begin']):
+        if not _has_structural(base):
             base = self.clean_output(base)
         
         return f'{base}^{{{sup}}}'
     
     def parse_sSub(self, elem):
         """Subscript"""
-        base_elem = elem.find('m:e', self.ns)
-        sub_elem = elem.find('m:sub', self.ns)
+        base_elem = _first(self._xp_e(elem))
+        sub_elem = _first(self._xp_sub(elem))
         
         base = self.parse(base_elem) if base_elem is not None else ''
         sub = self.parse(sub_elem) if sub_elem is not None else ''
@@ -223,9 +343,9 @@ class DirectOmmlToLatex:
     
     def parse_sSubSup(self, elem):
         """Sub and superscript"""
-        base_elem = elem.find('m:e', self.ns)
-        sub_elem = elem.find('m:sub', self.ns)
-        sup_elem = elem.find('m:sup', self.ns)
+        base_elem = _first(self._xp_e(elem))
+        sub_elem = _first(self._xp_sub(elem))
+        sup_elem = _first(self._xp_sup(elem))
         
         base = self.parse(base_elem) if base_elem is not None else ''
         sub = self.parse(sub_elem) if sub_elem is not None else ''
@@ -236,39 +356,39 @@ class DirectOmmlToLatex:
     
     def parse_nary(self, elem):
         """N-ary operations"""
-        chr_elem = elem.find('.//m:naryPr/m:chr', self.ns)
+        chr_elem = _first(self._xp_nary_chr(elem))
         
         if chr_elem is not None:
-            op_val = chr_elem.get(f'{{{self.ns["m"]}}}val', '∫')
+            op_val = chr_elem.get(_M_VAL, '∫')
         else:
             op_val = '∫'
         
         operator = self.smart_symbol_convert(op_val)
         
-        sub_elem = elem.find('m:sub', self.ns)
-        sup_elem = elem.find('m:sup', self.ns)
-        expr_elem = elem.find('m:e', self.ns)
+        sub_elem = _first(self._xp_sub(elem))
+        sup_elem = _first(self._xp_sup(elem))
+        expr_elem = _first(self._xp_e(elem))
         
-        result = operator
+        parts = [operator]
         if sub_elem is not None:
-            result += f'_{{{self.parse(sub_elem)}}}'
+            parts += ('_{', self.parse(sub_elem), '}')
         if sup_elem is not None:
-            result += f'^{{{self.parse(sup_elem)}}}'
+            parts += ('^{', self.parse(sup_elem), '}')
         if expr_elem is not None:
-            result += f' {self.parse(expr_elem)}'
+            parts += (' ', self.parse(expr_elem))
         
-        return result
+        return ''.join(parts)
     
     def parse_rad(self, elem):
         """Radical"""
-        deg_elem = elem.find('m:deg', self.ns)
-        expr_elem = elem.find('m:e', self.ns)
+        deg_elem = _first(self._xp_deg(elem))
+        expr_elem = _first(self._xp_e(elem))
         
         expr = self.parse(expr_elem) if expr_elem is not None else ''
         
         # Check if degree is hidden
-        deg_hide = elem.find('.//m:degHide', self.ns)
-        if deg_hide is not None and deg_hide.get(f'{{{self.ns["m"]}}}val') == '1':
+        deg_hide = _first(self._xp_deg_hide(elem))
+        if deg_hide is not None and deg_hide.get(_M_VAL) == '1':
             return f'\\sqrt{{{expr}}}'
         
         if deg_elem is not None:
@@ -280,30 +400,28 @@ class DirectOmmlToLatex:
     
     def parse_d(self, elem):
         """Delimiters - handle all types properly"""
-        beg_chr = elem.find('.//m:begChr', self.ns)
-        end_chr = elem.find('.//m:endChr', self.ns)
-        
         open_d = '('
         close_d = ')'
         
-        if beg_chr is not None:
-            open_d = beg_chr.get(f'{{{self.ns["m"]}}}val', '(')
-        if end_chr is not None:
-            close_d = end_chr.get(f'{{{self.ns["m"]}}}val', ')')
-        
-        # Get direct e children
-        e_children = []
+        # One pass over the direct children: delimiters from dPr, first e
+        first_e = None
         for child in elem:
-            if child.tag.endswith('e'):
-                e_children.append(child)
-        
-        if not e_children:
+            if child.tag == _M_DPR:
+                beg_chr = child.find(_M_BEG_CHR)
+                end_chr = child.find(_M_END_CHR)
+                if beg_chr is not None:
+                    open_d = beg_chr.get(_M_VAL, '(')
+                if end_chr is not None:
+                    close_d = end_chr.get(_M_VAL, ')')
+            elif child.tag == _M_E and first_e is None:
+                first_e = child
+        
+        if first_e is None:
             return ''
         
         # Check first e child for special structures
-        first_e = e_children[0]
         for grandchild in first_e:
-            if grandchild.tag.endswith('m'):
+            if grandchild.tag == _M_M:
                 # Matrix
                 matrix_type = 'pmatrix'
                 if open_d == '[':
@@ -313,7 +431,7 @@ class DirectOmmlToLatex:
                 elif open_d == '|':
                     matrix_type = 'vmatrix'
                 return self.parse_matrix(grandchild, matrix_type)
-            elif grandchild.tag.endswith('eqArr'):
+            elif grandchild.tag == _M_EQARR:
                 # Piecewise
                 content = self.parse(grandchild)
                 if open_d == '{' and (not close_d or close_d == ''):
@@ -340,19 +458,17 @@ class DirectOmmlToLatex:
         rows = []
         
         # Process each row (mr element)
-        for child in elem:
-            if child.tag.endswith('mr'):
-                cols = []
-                # Process each cell (e element) in the row
-                for cell in child:
-                    if cell.tag.endswith('e'):
-                        cell_content = self.parse(cell)
-                        if cell_content:
-                            cols.append(cell_content)
-                
-                # Only add non-empty rows
-                if cols:
-                    rows.append(' & '.join(cols))
+        for row in elem.iterchildren(_M_MR):
+            cols = []
+            # Process each cell (e element) in the row
+            for cell in row.iterchildren(_M_E):
+                cell_content = self.parse(cell)
+                if cell_content:
+                    cols.append(cell_content)
+            
+            # Only add non-empty rows
+            if cols:
+                rows.append(' & '.join(cols))
         
         # Join rows with line breaks
         if rows:
@@ -367,12 +483,12 @@ class DirectOmmlToLatex:
     
     def parse_func(self, elem):
         """Functions with proper handling"""
-        fname_elem = elem.find('m:fName', self.ns)
-        arg_elem = elem.find('m:e', self.ns)
+        fname_elem = _first(self._xp_fname(elem))
+        arg_elem = _first(self._xp_e(elem))
         
         # Handle limit with subscript
         if fname_elem is not None:
-            limlower = fname_elem.find('.//m:limLow', self.ns)
+            limlower = _first(self._xp_lim_low(fname_elem))
             if limlower is not None:
                 fname_parsed = self.parse(fname_elem)
                 arg_parsed = self.parse(arg_elem) if arg_elem is not None else ''
@@ -408,8 +524,8 @@ class DirectOmmlToLatex:
     
     def parse_limLow(self, elem):
         """Limit lower - for limits with subscripts"""
-        base_elem = elem.find('m:e', self.ns)
-        lim_elem = elem.find('m:lim', self.ns)
+        base_elem = _first(self._xp_e(elem))
+        lim_elem = _first(self._xp_lim(elem))
         
         base = self.parse(base_elem) if base_elem is not None else ''
         lim = self.parse(lim_elem) if lim_elem is not None else ''
@@ -424,13 +540,13 @@ class DirectOmmlToLatex:
     
     def parse_acc(self, elem):
         """Accents"""
-        chr_elem = elem.find('.//m:accPr/m:chr', self.ns)
-        base_elem = elem.find('m:e', self.ns)
+        chr_elem = _first(self._xp_acc_chr(elem))
+        base_elem = _first(self._xp_e(elem))
         
         base = self.parse(base_elem) if base_elem is not None else ''
         
         if chr_elem is not None:
-            acc_val = chr_elem.get(f'{{{self.ns["m"]}}}val', '')
+            acc_val = chr_elem.get(_M_VAL, '')
             accent_map = {
                 '̂': 'hat', '̃': 'tilde', '̄': 'bar',
                 '̇': 'dot', '̈': 'ddot', '⃗': 'vec',
@@ -443,11 +559,10 @@ class DirectOmmlToLatex:
     def parse_eqArr(self, elem):
         """Equation array for piecewise functions"""
         parts = []
-        for child in elem:
-            if child.tag.endswith('e'):
-                part = self.parse(child)
-                if part and part.strip():
-                    parts.append(part.strip())
+        for child in elem.iterchildren(_M_E):
+            part = self.parse(child)
+            if part and part.strip():
+                parts.append(part.strip())
         
         # Format for cases environment
         formatted_parts = []
@@ -477,21 +592,13 @@ class DirectOmmlToLatex:
     
     def parse_default(self, elem):
         """Default handler - process children sequentially"""
-        results = []
-        for child in elem:
-            result = self.parse(child)
-            if result:
-                results.append(result)
-        return ''.join(results)
+        parse = self.parse
+        return ''.join([parse(child) for child in elem])
     
     def parse_e(self, elem):
         """Element container"""
-        results = []
-        for child in elem:
-            result = self.parse(child)
-            if result:
-                results.append(result)
-        return ''.join(results)
+        parse = self.parse
+        return ''.join([parse(child) for child in elem])
     # Aliases for simple pass-through elements
     parse_num = parse_default
     parse_den = parse_default
@@ -505,18 +612,12 @@ class DirectOmmlToLatex:
     def apply_post_processing(self, latex):
         """Apply all post-processing fixes"""
         # All the fixes from process_word_document
-        latex = re.sub(r'\\binom([a-zA-Z])([a-zA-Z])', r'\\binom{\1}{\2}', latex)
-        latex = re.sub(r'(e\^{[^}]+}[a-z]+)(.*?)\1', r'\1\2', latex)
-        latex = re.sub(r'([a-zA-Z]+)\\left\(([^)]+)\\right\)\1', r'\1\\left(\2\\right)', latex)
-        latex = re.sub(r'\\partial([a-zA-Z])', r'\\partial \1', latex)
-        latex = re.sub(r'\\upsilon([a-zA-Z])', r'\\upsilon \1', latex)
-        latex = re.sub(r'\\gamma([a-zA-Z])', r'\\gamma \1', latex)
-        latex = re.sub(r'\\rightarrow([A-Z][a-z])', r'\\rightarrow \1', latex)
+        latex = _RE_BINOM_BARE.sub(r'\\binom{\1}{\2}', latex)
+        latex = _RE_EXP_REPEAT.sub(r'\1\2', latex)
+        latex = _RE_FUNC_REPEAT.sub(r'\1\\left(\2\\right)', latex)
         latex = latex.replace('⋅', r'\cdot')
-        latex = re.sub(r'(\\lim[^}]*})\s*\\lim\s', r'\1 ', latex)
-        latex = re.sub(r'(\\exists|\\forall)([a-zA-Z])', r'\1 \2', latex)
-        latex = re.sub(r'\\left\(\\binom\{([^}]+)\}\{([^}]+)\}\\right\)', r'\\binom{\1}{\2}', latex)
-        latex = re.sub(r'\\cdot([A-Za-z])', r'\\cdot \1', latex)
-        latex = re.sub(r'(\\approx|\\equiv|\\sim)(\d)', r'\1 \2', latex)
-        latex = re.sub(r'\\cdot([A-Za-z])', r'\\cdot \1', latex)
+        latex = _RE_LIM_REPEAT.sub(r'\1 ', latex)
+        latex = _RE_BINOM_PAREN.sub(r'\\binom{\1}{\2}', latex)
+        # \partial, \gamma, \cdot, \approx, ... spacing
+        latex = _RE_POST_SPACE.sub(_post_space, latex)
         return latex
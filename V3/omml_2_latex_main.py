@@ -4,25 +4,38 @@ import re
 from lxml import etree
 from omml_2_latex import DirectOmmlToLatex
 
+M_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/math'
+OMATH_TAG = f'{{{M_NS}}}oMath'
+M_T_TAG = f'{{{M_NS}}}t'
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W_BODY_TAG = f'{{{W_NS}}}body'
+W_P_TAG = f'{{{W_NS}}}p'
+W_TBL_TAG = f'{{{W_NS}}}tbl'
+
 
 def save_results(results, output_file='equations_fixed_1.tex'):
     """Save to LaTeX file"""
+    # Build the whole file in memory and write it once
+    parts = [
+        "\\documentclass{article}\n"
+        "\\usepackage{amsmath}\n"
+        "\\usepackage{amssymb}\n"
+        "\\usepackage{amsfonts}\n"
+        "\\begin{document}\n\n"
+    ]
+    
+    # eq['latex'] is already fully processed
+    parts.extend(
+        f"% Equation {eq['index']}\n"
+        f"\\begin{{equation}}\n"
+        f"  {eq['latex']}\n"
+        f"\\end{{equation}}\n\n"
+        for eq in results)
+    
+    parts.append("\\end{document}\n")
+    
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("\\documentclass{article}\n")
-        f.write("\\usepackage{amsmath}\n")
-        f.write("\\usepackage{amssymb}\n")
-        f.write("\\usepackage{amsfonts}\n")
-        f.write("\\begin{document}\n\n")
-        
-        for eq in results:
-            latex = eq['latex']  # Already fully processed!
-            
-            f.write(f"% Equation {eq['index']}\n")
-            f.write("\\begin{equation}\n")
-            f.write(f"  {latex}\n")
-            f.write("\\end{equation}\n\n")
-
-        f.write("\\end{document}\n")
+        f.write(''.join(parts))
 
 def process_word_document(docx_path):
     """Extract and convert equations with final cleanup"""
@@ -32,29 +45,61 @@ def process_word_document(docx_path):
     
     parser = DirectOmmlToLatex()
     results = []
+    seen = {}  # canonical OMML → LaTeX
     
     with zipfile.ZipFile(docx_path, 'r') as z:
         with z.open('word/document.xml') as f:
-            content = f.read()
-            root = etree.fromstring(content)
+            # Stream the XML: <m:oMath> elements are numbered as they start
+            # (document order) and converted as they end; body-level
+            # paragraphs and tables are dropped once done
+            context = etree.iterparse(f, events=('start', 'end'),
+                                      tag=(OMATH_TAG, W_P_TAG, W_TBL_TAG),
+                                      huge_tree=True)
             
-            ns = {'m': 'http://schemas.openxmlformats.org/officeDocument/2006/math'}
-            equations = root.xpath('//m:oMath', namespaces=ns)
-            
-            print(f"Found {len(equations)} equations\n")
-            
-            for i, eq in enumerate(equations, 1):
-                texts = eq.xpath('.//m:t/text()', namespaces=ns)
-                text = ''.join(texts)
+            i = 0
+            open_indexes = []  # numbers of the equations being parsed
+            for event, elem in context:
+                if event == 'start':
+                    if elem.tag == OMATH_TAG:
+                        i += 1
+                        open_indexes.append(i)
+                    continue
+                
+                if elem.tag != OMATH_TAG:
+                    parent = elem.getparent()
+                    if parent is not None and parent.tag == W_BODY_TAG:
+                        elem.clear()
+                        while elem.getprevious() is not None:
+                            del parent[0]
+                    continue
                 
-                latex = parser.parse(eq)
+                eq = elem
+                index = open_indexes.pop()
+                text = ''.join(eq.itertext(M_T_TAG, with_tail=False))
+                
+                # Reused formulas are converted once (same canonical XML,
+                # same LaTeX)
+                key = etree.tostring(eq, method='c14n')
+                latex = seen.get(key)
+                if latex is None:
+                    latex = parser.parse(eq)
+                    seen[key] = latex
                 results.append({
-                    'index': i,
+                    'index': index,
                     'text': text,
                     'latex': latex
                 })
                 
-                print(f"Equation {i}: {latex[:50]}...")
+                print(f"Equation {index}: {latex[:50]}...")
+                
+                # A nested equation is still part of the one around it,
+                # which has not been converted yet
+                if next(eq.iterancestors(OMATH_TAG), None) is None:
+                    eq.clear()
+    
+    # Nested equations end before the one around them
+    results.sort(key=lambda eq: eq['index'])
+    print(f"Found {len(results)} equations\n")
     
     return results
 
@@ -7,6 +7,7 @@ from docx import Document
 from docx.shared import Inches
 from typing import Dict, List
 import json
+from collections import Counter, defaultdict
 
 class AnchorGenerator:
     """Generate Word documents with anchors from converted HTML."""
@@ -51,16 +52,15 @@ class AnchorGenerator:
         from docx.oxml import OxmlElement
         from docx.oxml.ns import qn
         
+        # Resolved once instead of per bookmark
+        qn_id = qn('w:id')
+        qn_name = qn('w:name')
+        
         # Add summary section
         doc.add_heading('Document Anchors Summary', 1)
         
         # Count anchors by type
-        anchor_types = {}
-        for anchor_id, info in self.anchor_registry.items():
-            anchor_type = info.get('type', 'unknown')
-            if anchor_type not in anchor_types:
-                anchor_types[anchor_type] = 0
-            anchor_types[anchor_type] += 1
+        anchor_types = Counter(info.get('type', 'unknown') for info in self.anchor_registry.values())
         
         # Add summary paragraph
         summary_para = doc.add_paragraph()
@@ -72,12 +72,9 @@ class AnchorGenerator:
         doc.add_heading('Anchor Index', 1)
         
         # Group anchors by type
-        by_type = {}
+        by_type = defaultdict(list)
         for anchor_id, info in self.anchor_registry.items():
-            anchor_type = info.get('type', 'unknown')
-            if anchor_type not in by_type:
-                by_type[anchor_type] = []
-            by_type[anchor_type].append((anchor_id, info))
+            by_type[info.get('type', 'unknown')].append((anchor_id, info))
         
         # Add sections for each type
         for anchor_type, anchors in by_type.items():
@@ -87,12 +84,14 @@ class AnchorGenerator:
                 para = doc.add_paragraph()
                 
                 # Add bookmark for this anchor
+                bookmark_id = str(hash(anchor_id) % 100000)
+                
                 bookmark_start = OxmlElement('w:bookmarkStart')
-                bookmark_start.set(qn('w:id'), str(hash(anchor_id) % 100000))
-                bookmark_start.set(qn('w:name'), anchor_id)
+                bookmark_start.set(qn_id, bookmark_id)
+                bookmark_start.set(qn_name, anchor_id)
                 
                 bookmark_end = OxmlElement('w:bookmarkEnd')
-                bookmark_end.set(qn('w:id'), str(hash(anchor_id) % 100000))
+                bookmark_end.set(qn_id, bookmark_id)
                 
                 para._p.append(bookmark_start)
                 
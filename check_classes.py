@@ -1,8 +1,9 @@
 # check_classes.py
 """Check what classes are actually in your Python files."""
 
-import re
-from pathlib import Path
+import ast
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 print("=" * 60)
 print("CHECKING PYTHON FILES FOR CLASS DEFINITIONS")
@@ -20,40 +21,66 @@ files_to_check = [
     'anchor_generator.py'  # May not exist yet
 ]
 
+# Key methods a converter class should have
+methods_to_check = ['convert_folder', 'process_folder', '_convert_document']
+
 found_converters = []
 
-for filename in files_to_check:
-    file_path = Path(filename)
-    if file_path.exists():
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-                # Find all class definitions
-                classes = re.findall(r'^class\s+(\w+)', content, re.MULTILINE)
+# One directory listing instead of an exists() check per file
+present = {entry.name: entry for entry in os.scandir('.') if entry.is_file()}
+
+def scan_file(filename):
+    """Read and parse one file in a worker thread.
+    
+    Returns (filename, [(class, methods), ...] or None if missing, error).
+    """
+    entry = present.get(filename)
+    if entry is None:
+        return filename, None, None
+    
+    try:
+        with open(entry.path, 'rb') as f:
+            source = f.read()
+        classes = []
+        
+        # Skip parsing when the keyword isn't there at all
+        if b'class' in source:
+            # Find all top-level class definitions and their methods
+            tree = ast.parse(source, filename=filename)
+            classes = [
+                (node.name, {item.name for item in node.body
+                             if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))})
+                for node in tree.body if isinstance(node, ast.ClassDef)
+            ]
+        return filename, classes, None
+    except Exception as e:
+        return filename, None, e
+
+# Read and parse in parallel, report in the original order
+with ThreadPoolExecutor(max_workers=min(8, len(files_to_check))) as executor:
+    results = list(executor.map(scan_file, files_to_check))
+
+for filename, classes, error in results:
+    if error is not None:
+        print(f"\n📄 {filename}: Error reading - {error}")
+    elif classes is None:
+        print(f"\n📄 {filename}: ❌ File not found")
+    elif classes:
+        print(f"\n📄 {filename}:")
+        for cls, methods_found in classes:
+            print(f"   ✅ class {cls}")
+            
+            # Check for key methods in converter classes
+            if 'Converter' in cls or 'converter' in filename:
+                found_converters.append((filename, cls))
                 
-                if classes:
-                    print(f"\n📄 {filename}:")
-                    for cls in classes:
-                        print(f"   ✅ class {cls}")
-                        
-                        # Check for key methods in converter classes
-                        if 'Converter' in cls or 'converter' in filename:
-                            found_converters.append((filename, cls))
-                            
-                            # Check for important methods
-                            methods_to_check = ['convert_folder', 'process_folder', '_convert_document']
-                            print(f"      Methods:")
-                            for method in methods_to_check:
-                                if f"def {method}" in content:
-                                    print(f"         ✓ {method}()")
-                else:
-                    print(f"\n📄 {filename}: No classes found")
-                    
-        except Exception as e:
-            print(f"\n📄 {filename}: Error reading - {e}")
+                # Check for important methods
+                print(f"      Methods:")
+                for method in methods_to_check:
+                    if method in methods_found:
+                        print(f"         ✓ {method}()")
     else:
-        print(f"\n📄 {filename}: ❌ File not found")
+        print(f"\n📄 {filename}: No classes found")
 
 print("\n" + "=" * 60)
 print("SUMMARY - CONVERTER CLASSES FOUND:")
@@ -25,6 +25,10 @@ class CSSManager:
             'theme': 'theme-styles.css',
             'utilities': 'utilities.css'
         }
+        # CSS file name -> "/* name */\ncontent", read once per run
+        self._css_text_cache = {}
+        # (css types, relative path) -> joined <link> block
+        self._links_cache = {}
         
     def setup_css_folder(self):
         """Create CSS folder structure and copy CSS files."""
@@ -44,6 +48,12 @@ class CSSManager:
         if css_types is None:
             css_types = ['base', 'equations', 'tables', 'images', 'footnotes', 'anchors', 'print', 'responsive']
         
+        # Same profile and path every document in a batch - build it once
+        key = (tuple(css_types), relative_path)
+        cached = self._links_cache.get(key)
+        if cached is not None:
+            return cached
+        
         links = []
         for css_type in css_types:
             if css_type in self.css_files:
@@ -51,7 +61,8 @@ class CSSManager:
                 css_path = f"{relative_path}assets/css/{css_file}"
                 links.append(f'    <link rel="stylesheet" href="{css_path}">')
         
-        return '\n'.join(links)
+        self._links_cache[key] = '\n'.join(links)
+        return self._links_cache[key]
     
     def get_inline_css(self, css_types: List[str] = None) -> str:
         """Get CSS content as inline styles (fallback option)."""
@@ -62,10 +73,15 @@ class CSSManager:
         for css_type in css_types:
             if css_type in self.css_files:
                 css_file = self.css_files[css_type]
-                css_path = self.css_folder / css_file
-                if css_path.exists():
+                css_text = self._css_text_cache.get(css_file)
+                if css_text is None:
+                    css_path = self.css_folder / css_file
+                    if not css_path.exists():
+                        continue
                     with open(css_path, 'r', encoding='utf-8') as f:
-                        css_content.append(f"/* {css_file} */\n{f.read()}")
+                        css_text = f"/* {css_file} */\n{f.read()}"
+                    self._css_text_cache[css_file] = css_text
+                css_content.append(css_text)
         
         return '\n'.join(css_content)
     
@@ -78,6 +94,15 @@ class CSSManager:
             src = self.css_folder / css_file
             dst = css_output / css_file
             if src.exists():
-                shutil.copy2(src, dst)
+                # Skip files already copied and not changed since
+                src_stat = src.stat()
+                if dst.exists():
+                    dst_stat = dst.stat()
+                    if (dst_stat.st_size == src_stat.st_size and
+                            dst_stat.st_mtime_ns >= src_stat.st_mtime_ns):
+                        continue
+                
+                # Content only - the output copy needs no source metadata
+                shutil.copyfile(src, dst)
                 self.logger.debug(f"Copied {css_file} to output folder")
 
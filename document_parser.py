@@ -1,31 +1,87 @@
 # document_parser.py
 """Parse Word documents and extract content."""
 
+import copy
 import logging
 from pathlib import Path
 from typing import Optional, List
 import docx
-from docx2python import docx2python
+from docx.enum.style import WD_STYLE_TYPE
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from lxml import etree
 from models import DocumentContent, ImageInfo, FootnoteInfo
 from utils import extract_text_safely, detect_latex_equations
 
+# Parsed documents kept per parser, oldest dropped first. Off by default:
+# a batch run parses every file once, so the cache would never hit
+CONTENT_CACHE_SIZE = 0
+
+def _iter_text(parts):
+    """Yield the non-empty strings of a (nested) footnote list, in order."""
+    for part in parts:
+        if isinstance(part, list):
+            yield from _iter_text(part)
+        elif part:
+            yield str(part)
+
+def _paragraph_text(p) -> str:
+    """Text of a w:p element: its runs, hyperlink runs included, in order."""
+    return ''.join([r.text for r in p.xpath('w:r | w:hyperlink/w:r')])
+
 class DocumentParser:
     """Handles parsing of Word documents."""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = CONTENT_CACHE_SIZE):
         self.logger = logging.getLogger(__name__)
+        self.cache_size = cache_size
+        
+        # Body element handlers keyed by exact (namespaced) tag
+        self._body_handlers = {
+            qn('w:p'): self._body_paragraph_to_html,
+            qn('w:tbl'): self._body_table_to_html,
+        }
+        
+        # (path, mtime_ns) -> parsed DocumentContent
+        self._content_cache = {}
     
     def parse_document(self, file_path: Path) -> Optional[DocumentContent]:
-        """Parse a Word document and extract all content."""
+        """Parse a Word document and extract all content.
+        
+        With a cache_size, unchanged files are parsed once; callers get
+        their own copy.
+        """
+        if not self.cache_size:
+            return self._parse_document(file_path)
+        
+        try:
+            key = (str(file_path), file_path.stat().st_mtime_ns)
+        except OSError as e:
+            self.logger.error(f"Error parsing {file_path}: {e}")
+            return None
+        
+        # Callers modify body_html and images in place
+        content = self._content_cache.get(key)
+        if content is not None:
+            return copy.deepcopy(content)
+        
+        content = self._parse_document(file_path)
+        if content is not None:
+            if len(self._content_cache) >= self.cache_size:
+                del self._content_cache[next(iter(self._content_cache))]
+            self._content_cache[key] = copy.deepcopy(content)
+        return content
+    
+    def _parse_document(self, file_path: Path) -> Optional[DocumentContent]:
+        """Parse a Word document without the cache."""
         try:
             self.logger.info(f"Parsing document: {file_path.name}")
             
             # Use python-docx for structure
             doc = docx.Document(file_path)
             
-            # Use docx2python for footnotes
-            with docx2python(str(file_path)) as docx_content:
-                footnotes_data = docx_content.footnotes
+            # Footnotes come from the same package - no second parse of the file
+            footnotes_data = self._read_footnotes(doc)
             
             # Extract content
             content = DocumentContent(
@@ -38,30 +94,15 @@ class DocumentParser:
             
             # Parse body content
             body_parts = []
-            image_counter = 0
+            handlers = self._body_handlers
+            self._style_names = self._paragraph_style_names(doc)
             
             for element in doc.element.body:
-                if element.tag.endswith('p'):
-                    # Handle paragraph
-                    para = docx.text.paragraph.Paragraph(element, doc)
-                    html = self._paragraph_to_html(para)
-                    if html:
-                        body_parts.append(html)
-                        
-                elif element.tag.endswith('tbl'):
-                    # Handle table
-                    table = docx.table.Table(element, doc)
-                    html = self._table_to_html(table)
+                handler = handlers.get(element.tag)
+                if handler:
+                    html = handler(element, doc, content)
                     if html:
                         body_parts.append(html)
-                
-                # Check for images in runs
-                for para in doc.paragraphs:
-                    for run in para.runs:
-                        if 'graphic' in run._element.xml:
-                            image_counter += 1
-                            img_info = ImageInfo(number=image_counter)
-                            content.images.append(img_info)
             
             content.body_html = "\n".join(body_parts)
             
@@ -75,6 +116,53 @@ class DocumentParser:
             self.logger.error(f"Error parsing {file_path}: {e}")
             return None
     
+    def _paragraph_style_names(self, doc) -> dict:
+        """Map paragraph style ids to names, as Paragraph.style resolves them."""
+        default = doc.styles.default(WD_STYLE_TYPE.PARAGRAPH)
+        names = {None: default.name if default is not None else None}
+        
+        # First style with an id wins; ids of other style types fall back
+        seen = set()
+        for style in doc.styles:
+            if style.style_id in seen:
+                continue
+            seen.add(style.style_id)
+            if style.type == WD_STYLE_TYPE.PARAGRAPH:
+                names[style.style_id] = style.name
+        return names
+    
+    def _body_paragraph_to_html(self, element, doc, content) -> str:
+        """Handle a body paragraph, recording its images."""
+        runs = element.r_lst
+        formatted = False
+        
+        for r in runs:
+            # Check for images in this paragraph's runs
+            if r.find('.//{*}graphic') is not None:
+                img_info = ImageInfo(number=len(content.images) + 1)
+                content.images.append(img_info)
+            
+            rPr = r.rPr
+            if rPr is not None and (rPr.b is not None or rPr.i is not None):
+                formatted = True
+        
+        # Bold / italic runs need the full python-docx Paragraph
+        if formatted:
+            para = docx.text.paragraph.Paragraph(element, doc)
+            return self._paragraph_to_html(para)
+        
+        # Plain paragraph - text and style straight from the XML
+        text = _paragraph_text(element)
+        if not text:
+            return ""
+        
+        style_name = self._style_names.get(element.style, self._style_names[None])
+        return self._wrap_paragraph(text, style_name) or f"<p>{text}</p>"
+    
+    def _body_table_to_html(self, element, doc, content) -> str:
+        """Handle a body table."""
+        return self._table_to_html(element)
+    
     def _extract_title(self, doc) -> str:
         """Extract document title."""
         # Try core properties first
@@ -100,25 +188,45 @@ class DocumentParser:
         return "Unknown"
     
 
+    def _read_footnotes(self, doc) -> List[List[str]]:
+        """Read footnote paragraphs from the already-loaded docx package."""
+        footnotes_part = None
+        for rel in doc.part.rels.values():
+            if rel.reltype == RT.FOOTNOTES and not rel.is_external:
+                footnotes_part = rel.target_part
+                break
+        
+        if footnotes_part is None:
+            return []
+        
+        w_t = qn('w:t')
+        w_type = qn('w:type')
+        root = etree.fromstring(footnotes_part.blob)
+        
+        footnotes = []
+        for footnote in root.iterchildren(qn('w:footnote')):
+            # Skip separator / continuation footnotes
+            if footnote.get(w_type, 'normal') != 'normal':
+                continue
+            footnotes.append([
+                ''.join(t.text or '' for t in para.iter(w_t))
+                for para in footnote.iter(qn('w:p'))
+            ])
+        
+        return footnotes
+    
     def _extract_footnotes(self, footnotes_data) -> List[FootnoteInfo]:
-        """Extract footnotes from docx2python data."""
+        """Extract footnotes from the per-footnote paragraph lists."""
         footnotes = []
         
         try:
             if footnotes_data:
-                # docx2python returns footnotes as a flat list
-                # Each footnote is a list of text runs
+                # One entry per footnote, in document order
+                # Each footnote is a list of paragraph texts
                 for idx, footnote_content in enumerate(footnotes_data):
                     if footnote_content and isinstance(footnote_content, list):
                         # Join all text runs in the footnote
-                        text_parts = []
-                        for part in footnote_content:
-                            if isinstance(part, list):
-                                text_parts.extend(part)
-                            else:
-                                text_parts.append(str(part))
-                        
-                        text = " ".join(str(p) for p in text_parts if p)
+                        text = " ".join(_iter_text(footnote_content))
                         
                         if text.strip():
                             has_latex, _ = detect_latex_equations(text)
@@ -144,8 +252,34 @@ class DocumentParser:
             return ""
         
         # Determine HTML tag based on style
-        style_name = paragraph.style.name
-        
+        html = self._wrap_paragraph(text, paragraph.style.name)
+        if html:
+            return html
+        else:
+            # Handle inline formatting - wrap each run on its own, in order
+            html_parts = []
+            
+            # Walk runs and hyperlinks in document order (python-docx 1.x);
+            # older releases only expose the runs
+            if hasattr(paragraph, 'iter_inner_content'):
+                items = paragraph.iter_inner_content()
+            else:
+                items = paragraph.runs
+            
+            # Check for bold, italic, etc. - hyperlink text goes in as-is
+            for item in items:
+                run_text = item.text
+                if isinstance(item, docx.text.run.Run):
+                    if item.italic:
+                        run_text = f"<em>{run_text}</em>"
+                    if item.bold:
+                        run_text = f"<strong>{run_text}</strong>"
+                html_parts.append(run_text)
+            
+            return f"<p>{''.join(html_parts)}</p>"
+    
+    def _wrap_paragraph(self, text, style_name) -> str:
+        """Heading / title HTML for a paragraph style, "" for body text."""
         if style_name.startswith('Heading 1'):
             return f"<h1>{text}</h1>"
         elif style_name.startswith('Heading 2'):
@@ -156,30 +290,38 @@ class DocumentParser:
             return f"<h4>{text}</h4>"
         elif style_name == 'Title':
             return f"<h1 class='title'>{text}</h1>"
-        else:
-            # Handle inline formatting
-            html_text = text
-            
-            # Check for bold, italic, etc.
-            for run in paragraph.runs:
-                run_text = run.text
-                if run.bold:
-                    html_text = html_text.replace(run_text, f"<strong>{run_text}</strong>")
-                if run.italic:
-                    html_text = html_text.replace(run_text, f"<em>{run_text}</em>")
-            
-            return f"<p>{html_text}</p>"
+        return ""
     
-    def _table_to_html(self, table) -> str:
-        """Convert table to HTML."""
+    def _cell_text(self, tc) -> str:
+        """Cell text from the XML - same as _Cell.text, without the proxies."""
+        return '\n'.join([_paragraph_text(p) for p in tc.p_lst])
+    
+    def _table_to_html(self, tbl) -> str:
+        """Convert a w:tbl element to HTML.
+        
+        One cell per layout-grid column, like python-docx's row.cells: a
+        gridSpan cell repeats over the columns it spans, a vMerge
+        continuation repeats the cell above. Each w:tc is read once.
+        """
         html_parts = ["<table class='document-table'>"]
         
-        for row in table.rows:
+        above = {}  # grid column -> cell text in the row above
+        for tr in tbl.tr_lst:
+            row = {}
+            column = int(tr.xpath('string(w:trPr/w:gridBefore/@w:val)') or 0)
             html_parts.append("<tr>")
-            for cell in row.cells:
-                cell_text = extract_text_safely(cell)
-                html_parts.append(f"<td>{cell_text}</td>")
+            for tc in tr.tc_lst:
+                span = tc.grid_span
+                if tc.vMerge == 'continue':
+                    text = above.get(column, '')
+                else:
+                    text = self._cell_text(tc)
+                html_parts.extend([f"<td>{text}</td>"] * span)
+                for offset in range(span):
+                    row[column + offset] = text
+                column += span
             html_parts.append("</tr>")
+            above = row
         
         html_parts.append("</table>")
         return "\n".join(html_parts)
@@ -4,10 +4,261 @@
 import re
 import logging
 import zipfile
-import xml.etree.ElementTree as ET
+from contextlib import nullcontext
+from lxml import etree
 from typing import Dict, List, Tuple
 from pathlib import Path
 
+try:
+    # mammoth's (font, code) -> Unicode table for w:sym characters
+    from mammoth.docx.dingbats import dingbats as _DINGBATS
+except ImportError:
+    _DINGBATS = None
+
+# Clark-notation tags for the streamed document.xml
+W_P = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p'
+M_OMATH = '{http://schemas.openxmlformats.org/officeDocument/2006/math}oMath'
+M_OMATH_PARA = '{http://schemas.openxmlformats.org/officeDocument/2006/math}oMathPara'
+M_T = '{http://schemas.openxmlformats.org/officeDocument/2006/math}t'
+W_T = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t'
+W_TAB = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}tab'
+W_SYM = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}sym'
+W_FONT = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}font'
+W_CHAR = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}char'
+W_TR = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}tr'
+W_TC = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}tc'
+W_TR_PR = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}trPr'
+W_TC_PR = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}tcPr'
+W_DEL = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}del'
+W_VMERGE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}vMerge'
+W_GRID_SPAN = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}gridSpan'
+W_VAL = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}val'
+M_FRAC = '{http://schemas.openxmlformats.org/officeDocument/2006/math}frac'
+M_RAD = '{http://schemas.openxmlformats.org/officeDocument/2006/math}rad'
+M_SUP = '{http://schemas.openxmlformats.org/officeDocument/2006/math}sup'
+M_SUB = '{http://schemas.openxmlformats.org/officeDocument/2006/math}sub'
+
+# Operand selectors for the Office Math templates, compiled once with the
+# namespace bound (first matching descendant, in document order)
+_MATH_NS = {'m': 'http://schemas.openxmlformats.org/officeDocument/2006/math'}
+_X_NUM = etree.XPath('(.//m:num)[1]', namespaces=_MATH_NS)
+_X_DEN = etree.XPath('(.//m:den)[1]', namespaces=_MATH_NS)
+_X_DEG = etree.XPath('(.//m:deg)[1]', namespaces=_MATH_NS)
+_X_E = etree.XPath('(.//m:e)[1]', namespaces=_MATH_NS)
+_X_SUP = etree.XPath('(.//m:sup)[1]', namespaces=_MATH_NS)
+_X_SUB = etree.XPath('(.//m:sub)[1]', namespaces=_MATH_NS)
+
+# Targets of image relationships whose name suggests an equation
+# ('equation' is covered by 'eq'); case-folded the way str.lower() would
+_EQ_IMAGE_TARGETS = etree.XPath(
+    "//r:Relationship[contains(@Target, 'media/')]"
+    "[contains(translate(@Target, 'EQFORMULA', 'eqformula'), 'eq')"
+    " or contains(translate(@Target, 'EQFORMULA', 'eqformula'), 'formula')]/@Target",
+    namespaces={'r': 'http://schemas.openxmlformats.org/package/2006/relationships'})
+
+# Math structure -> (first operand, second operand, LaTeX template)
+_MATH_TEMPLATES = {
+    M_FRAC: (_X_NUM, _X_DEN, '\\frac{{{0}}}{{{1}}}'),
+    M_RAD: (_X_DEG, _X_E, '\\sqrt[{0}]{{{1}}}'),
+    M_SUP: (_X_E, _X_SUP, '{0}^{{{1}}}'),
+    M_SUB: (_X_E, _X_SUB, '{0}_{{{1}}}'),
+}
+_SQRT_TEMPLATE = '\\sqrt{{{1}}}'  # radical without a degree
+
+# Parsed equations kept per processor, keyed on their serialized XML
+MATH_CACHE_SIZE = 2048
+
+# Patterns compiled once at import
+_FRAC_RE = re.compile(r'(\d+)\s*/\s*(\d+)')
+_SUP_RE = re.compile(r'(\w+)\^(\d+)')
+_SUB_RE = re.compile(r'(\w+)_(\d+)')
+
+# LaTeX equations in raw document text - all four delimiters in one scan,
+# the named group tells which one matched
+_LATEX_EQ_RE = re.compile(
+    r'\$\$(?P<dollars>[^$]+)\$\$'
+    r'|\$(?P<dollar>[^$\n]+)\$'
+    r'|\\\[(?P<bracket>[^\]]+)\\\]'
+    r'|\\\((?P<paren>[^\)]+)\\\)')
+_LATEX_EQ_TYPES = {'dollars': 'display', 'dollar': 'inline',
+                   'bracket': 'display', 'paren': 'inline'}
+
+# Unicode math symbols -> LaTeX commands (single characters, one C-level pass)
+_SYMBOL_TABLE = str.maketrans({
+    '÷': '\\div', '×': '\\times', '±': '\\pm',
+    '≈': '\\approx', '≠': '\\neq', '≤': '\\leq',
+    '≥': '\\geq', '∞': '\\infty', '∑': '\\sum',
+    '∫': '\\int', '√': '\\sqrt', '∂': '\\partial',
+    '∈': '\\in', '∉': '\\notin', '∅': '\\emptyset',
+    'α': '\\alpha', 'β': '\\beta', 'γ': '\\gamma',
+    'δ': '\\delta', 'ε': '\\epsilon', 'θ': '\\theta',
+    'λ': '\\lambda', 'μ': '\\mu', 'π': '\\pi',
+    'σ': '\\sigma', 'τ': '\\tau', 'φ': '\\phi',
+    'ω': '\\omega', 'Σ': '\\Sigma', 'Δ': '\\Delta',
+    'Ω': '\\Omega', '→': '\\rightarrow', '←': '\\leftarrow',
+    '⇒': '\\Rightarrow', '⇔': '\\Leftrightarrow',
+})
+
+# Raw document text along the lines of mammoth.extract_raw_text: w:t text,
+# run tabs, hyphen and w:sym characters, a blank line after every paragraph.
+# The subtrees below contribute nothing (w:fldSimple is not read by mammoth),
+# nor do deleted table rows and vertically merged continuation cells
+_RAW_TEXT_CHARS = {
+    W_TAB: '\t',
+    '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}noBreakHyphen': '\u2011',
+    '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}softHyphen': '\u00ad',
+}
+_RAW_TEXT_SKIP = {
+    '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}pPr',
+    '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}rPr',
+    '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}del',
+    '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}moveFrom',
+    '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}fldSimple',
+    '{http://schemas.openxmlformats.org/markup-compatibility/2006}Choice',
+    M_OMATH,
+    M_OMATH_PARA,
+}
+
+# Office Math placeholders left in the HTML, e.g. [EQUATION_eq_3_0]
+_EQ_MARKER_RE = re.compile(r'\[EQUATION_[^\[\]]*\]')
+
+def _alternation_re(strings):
+    """Compile one regex matching any of the literal strings, longest first."""
+    return re.compile('|'.join(re.escape(text) for text in sorted(strings, key=len, reverse=True)))
+
+def _operand_text(texts: Dict, selector, elem) -> str:
+    """m:t text of the operand picked by selector, '' when it is missing."""
+    for node in selector(elem):
+        return texts[node]
+    return ''
+
+def _symbol_text(sym) -> str:
+    """Character of a w:sym element, mapped through its font as mammoth does.
+    
+    '' for characters mammoth ignores; without mammoth the w:char code
+    point itself.
+    """
+    char = sym.get(W_CHAR)
+    try:
+        code = int(char, 16)
+    except (TypeError, ValueError):
+        return ''
+    if _DINGBATS is None:
+        return chr(code)
+    
+    font = sym.get(W_FONT)
+    code_point = _DINGBATS.get((font, code))
+    # Symbol fonts often use the private-use range F0xx for their characters
+    if code_point is None and re.match('^F0..', char):
+        code_point = _DINGBATS.get((font, int(char[2:], 16)))
+    return chr(code_point) if code_point is not None else ''
+
+def _grid_span(tc) -> int:
+    """Number of grid columns a table cell spans."""
+    span = tc.find(f'{W_TC_PR}/{W_GRID_SPAN}')
+    try:
+        return int(span.get(W_VAL)) if span is not None else 1
+    except (TypeError, ValueError):
+        return 1
+
+def _cell_start(tc) -> int:
+    """Grid column a table cell starts at."""
+    return sum(_grid_span(cell) for cell in tc.itersiblings(W_TC, preceding=True))
+
+def _row_deleted(tr) -> bool:
+    return tr.find(f'{W_TR_PR}/{W_DEL}') is not None
+
+def _merged_away(tc) -> bool:
+    """True for a vMerge continuation cell mammoth folds into the cell above.
+    
+    As in mammoth, that is when an earlier (not deleted) row of the table
+    has a cell starting at the same grid column.
+    """
+    vmerge = tc.find(f'{W_TC_PR}/{W_VMERGE}')
+    if vmerge is None or vmerge.get(W_VAL) not in (None, '', 'continue'):
+        return False
+    
+    tr = tc.getparent()
+    if tr is None or tr.tag != W_TR:
+        return False
+    column = _cell_start(tc)
+    for row in tr.itersiblings(W_TR, preceding=True):
+        if _row_deleted(row):
+            continue
+        for cell in row.iterchildren(W_TC):
+            if _cell_start(cell) == column:
+                return True
+    return False
+
+def _in_raw_text(para) -> bool:
+    """False for paragraphs of deleted rows and merged-away table cells."""
+    for ancestor in para.iterancestors(W_TC, W_TR):
+        if ancestor.tag == W_TR:
+            if _row_deleted(ancestor):
+                return False
+        elif _merged_away(ancestor):
+            return False
+    return True
+
+def _append_raw_text(para, parts: List[str]):
+    """Append the raw text of a paragraph to parts.
+    
+    Paragraphs nested inside it (text boxes) follow it, as in mammoth.
+    """
+    if not _in_raw_text(para):
+        return
+    
+    nested = []
+    _append_run_text(para, parts, nested)
+    parts.append('\n\n')
+    
+    for inner in nested:
+        _append_raw_text(inner, parts)
+
+def _append_run_text(elem, parts: List[str], nested: List):
+    """Append the text under elem, setting nested paragraphs aside."""
+    for child in elem:
+        tag = child.tag
+        if tag == W_T:
+            if child.text:
+                parts.append(child.text)
+        elif tag in _RAW_TEXT_CHARS:
+            parts.append(_RAW_TEXT_CHARS[tag])
+        elif tag == W_SYM:
+            parts.append(_symbol_text(child))
+        elif tag == W_P:
+            nested.append(child)
+        elif tag not in _RAW_TEXT_SKIP:
+            _append_run_text(child, parts, nested)
+
+def _iter_body_paragraphs(xml_file):
+    """Stream the outermost w:p elements of document.xml, freeing each one after use."""
+    context = etree.iterparse(xml_file, events=('end',), tag=W_P,
+                              remove_comments=True, remove_pis=True,
+                              huge_tree=True)
+    
+    for _, elem in context:
+        # Paragraphs nested in another one (text boxes) are handled
+        # with the outer paragraph, in document order
+        if next(elem.iterancestors(W_P), None) is not None:
+            continue
+        
+        yield elem
+        
+        # Free the paragraph and everything parsed before it; a cell's
+        # w:tcPr stays, later paragraphs of the table still look at it
+        elem.clear()
+        parent = elem.getparent()
+        first = 1 if parent[0].tag == W_TC_PR else 0
+        while parent[first] is not elem:
+            del parent[first]
+
+def _open_docx(docx_path: Path, zip_file: zipfile.ZipFile = None):
+    """Open the docx archive, or reuse an already open one without closing it."""
+    if zip_file is not None:
+        return nullcontext(zip_file)
+    return zipfile.ZipFile(docx_path, 'r')
+
 class EquationProcessor:
     """Advanced processor for handling equations in Word documents."""
     
@@ -15,6 +266,7 @@ class EquationProcessor:
         self.logger = logging.getLogger(__name__)
         self.equation_counter = 0
         self.equation_registry = {}
+        self._math_cache = {}
     
     def extract_all_equations(self, docx_path: Path) -> Dict[str, any]:
         """Extract all types of equations from Word document."""
@@ -24,30 +276,48 @@ class EquationProcessor:
             'images': []
         }
         
-        # Extract Office Math equations with positions
-        equations['office_math'] = self._extract_office_math_with_positions(docx_path)
-        
-        # Extract LaTeX equations
-        equations['latex'] = self._extract_latex_equations(docx_path)
+        # Open the archive once for the Office Math and image passes; if it
+        # cannot be opened each extractor reports the error itself
+        try:
+            zip_file = zipfile.ZipFile(docx_path, 'r')
+        except Exception:
+            zip_file = None
         
-        # Extract equation images
-        equations['images'] = self._extract_equation_images(docx_path)
+        try:
+            # Extract Office Math equations with positions, collecting the
+            # document's raw text in the same pass
+            text_parts = []
+            equations['office_math'] = self._extract_office_math_with_positions(
+                docx_path, zip_file, text_parts)
+            
+            # Extract LaTeX equations - from the shared text, or from its own
+            # read of document.xml when the Office Math pass left none
+            raw_text = ''.join(text_parts) if text_parts else None
+            equations['latex'] = self._extract_latex_equations(docx_path, raw_text)
+            
+            # Extract equation images
+            equations['images'] = self._extract_equation_images(docx_path, zip_file)
+        finally:
+            if zip_file is not None:
+                zip_file.close()
         
         return equations
     
-    def _extract_office_math_with_positions(self, docx_path: Path) -> List[Dict]:
-        """Extract Office Math equations with their document positions."""
+    def _extract_office_math_with_positions(self, docx_path: Path,
+                                            zip_file: zipfile.ZipFile = None,
+                                            text_parts: List[str] = None) -> List[Dict]:
+        """Extract Office Math equations with their document positions.
+        
+        If text_parts is given, the raw text of every paragraph is appended to it.
+        """
         equations = []
         
         try:
-            with zipfile.ZipFile(docx_path, 'r') as zip_file:
-                if 'word/document.xml' not in zip_file.namelist():
+            with _open_docx(docx_path, zip_file) as zip_file:
+                if 'word/document.xml' not in zip_file.NameToInfo:
                     return equations
                 
                 with zip_file.open('word/document.xml') as xml_file:
-                    tree = ET.parse(xml_file)
-                    root = tree.getroot()
-                    
                     # Namespaces for parsing
                     ns = {
                         'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
@@ -57,186 +327,164 @@ class EquationProcessor:
                     # Track paragraph index for position mapping
                     para_index = 0
                     
-                    # Find all paragraphs
-                    for para in root.findall('.//w:p', ns):
-                        para_index += 1
+                    # Stream the paragraphs; each one is freed once handled
+                    for elem in _iter_body_paragraphs(xml_file):
+                        if text_parts is not None:
+                            _append_raw_text(elem, text_parts)
                         
-                        # Check for Office Math in paragraph
-                        math_elements = para.findall('.//m:oMath', ns)
-                        
-                        for math_idx, math_elem in enumerate(math_elements):
-                            eq_id = f"eq_{para_index}_{math_idx}"
+                        for para in elem.iter(W_P):
+                            para_index += 1
                             
-                            # Extract equation content
-                            equation_data = self._parse_office_math_element(math_elem, ns)
+                            # Check for Office Math in paragraph
+                            math_elements = para.findall('.//' + M_OMATH)
                             
-                            equations.append({
-                                'id': eq_id,
-                                'paragraph': para_index,
-                                'position': math_idx,
-                                'type': 'inline' if self._is_inline_math(math_elem, ns) else 'display',
-                                'content': equation_data['text'],
-                                'latex': equation_data['latex'],
-                                'anchor': f"equation-{eq_id}"
-                            })
+                            for math_idx, math_elem in enumerate(math_elements):
+                                eq_id = f"eq_{para_index}_{math_idx}"
+                                
+                                # Extract equation content
+                                equation_data = self._parse_office_math_element(math_elem, ns)
+                                
+                                # The paragraph is still whole here, so the parent is at
+                                # hand; only an m:oMathPara makes it display math
+                                is_display = math_elem.getparent().tag == M_OMATH_PARA
+                                
+                                equations.append({
+                                    'id': eq_id,
+                                    'paragraph': para_index,
+                                    'position': math_idx,
+                                    'type': 'display' if is_display else 'inline',
+                                    'content': equation_data['text'],
+                                    'latex': equation_data['latex'],
+                                    'anchor': f"equation-{eq_id}"
+                                })
                     
         except Exception as e:
             self.logger.error(f"Error extracting Office Math: {e}")
+            if text_parts:
+                # Text of a read that stopped part way would truncate the
+                # LaTeX pass - drop it so that pass reads the document itself
+                self.logger.warning("Raw text incomplete, LaTeX pass re-reads the document")
+                text_parts.clear()
         
         return equations
     
     def _parse_office_math_element(self, math_elem, ns: Dict) -> Dict:
         """Parse Office Math element to extract content and convert to LaTeX."""
-        text_parts = []
+        # Repeated equations (table headers, references) are parsed once
+        key = etree.tostring(math_elem, with_tail=False)
+        cached = self._math_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+        
+        # m:t runs in document order, tag-filtered by lxml
+        text_parts = [t.text for t in math_elem.iter(M_T) if t.text]
         latex_parts = []
         
-        # Process different math structures
-        for elem in math_elem.iter():
-            tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
+        # Math structures with a template, in document order
+        structures = list(math_elem.iter(*_MATH_TEMPLATES))
+        
+        if structures:
+            # m:t text under every element, built bottom-up in one pass
+            # (iter() yields parents before children, so walk it backwards)
+            texts = {}
+            for elem in reversed(list(math_elem.iter())):
+                text = ''.join([texts[child] for child in elem])
+                if elem.tag == M_T and elem.text:
+                    text = elem.text + text
+                texts[elem] = text
             
-            if tag == 't':  # Text element
-                if elem.text:
-                    text_parts.append(elem.text)
-                    
-            elif tag == 'frac':  # Fraction
-                num = self._get_math_text(elem.find('.//m:num', ns), ns)
-                den = self._get_math_text(elem.find('.//m:den', ns), ns)
-                latex_parts.append(f"\\frac{{{num}}}{{{den}}}")
-                
-            elif tag == 'rad':  # Radical (square root)
-                deg = elem.find('.//m:deg', ns)
-                rad_content = self._get_math_text(elem.find('.//m:e', ns), ns)
-                if deg is not None and self._get_math_text(deg, ns):
-                    latex_parts.append(f"\\sqrt[{self._get_math_text(deg, ns)}]{{{rad_content}}}")
-                else:
-                    latex_parts.append(f"\\sqrt{{{rad_content}}}")
-                    
-            elif tag == 'sup':  # Superscript
-                base = self._get_math_text(elem.find('.//m:e', ns), ns)
-                sup = self._get_math_text(elem.find('.//m:sup', ns), ns)
-                latex_parts.append(f"{base}^{{{sup}}}")
-                
-            elif tag == 'sub':  # Subscript
-                base = self._get_math_text(elem.find('.//m:e', ns), ns)
-                sub = self._get_math_text(elem.find('.//m:sub', ns), ns)
-                latex_parts.append(f"{base}_{{{sub}}}")
+            # Process different math structures
+            for elem in structures:
+                first, second, template = _MATH_TEMPLATES[elem.tag]
+                first = _operand_text(texts, first, elem)
+                if not first and elem.tag == M_RAD:
+                    template = _SQRT_TEMPLATE
+                latex_parts.append(template.format(first, _operand_text(texts, second, elem)))
         
         # Combine text and generate LaTeX
         text = ' '.join(text_parts)
         latex = ' '.join(latex_parts) if latex_parts else self._text_to_latex(text)
         
-        return {
+        result = {
             'text': text,
             'latex': latex
         }
-    
-    def _get_math_text(self, elem, ns: Dict) -> str:
-        """Get text content from math element."""
-        if elem is None:
-            return ""
         
-        text_parts = []
-        for t_elem in elem.findall('.//m:t', ns):
-            if t_elem.text:
-                text_parts.append(t_elem.text)
+        if len(self._math_cache) >= MATH_CACHE_SIZE:
+            del self._math_cache[next(iter(self._math_cache))]
+        self._math_cache[key] = result
         
-        return ''.join(text_parts)
+        return dict(result)
     
     def _text_to_latex(self, text: str) -> str:
         """Convert plain text to LaTeX format with symbol replacements."""
-        replacements = [
-            ('÷', '\\div'), ('×', '\\times'), ('±', '\\pm'),
-            ('≈', '\\approx'), ('≠', '\\neq'), ('≤', '\\leq'),
-            ('≥', '\\geq'), ('∞', '\\infty'), ('∑', '\\sum'),
-            ('∫', '\\int'), ('√', '\\sqrt'), ('∂', '\\partial'),
-            ('∈', '\\in'), ('∉', '\\notin'), ('∅', '\\emptyset'),
-            ('α', '\\alpha'), ('β', '\\beta'), ('γ', '\\gamma'),
-            ('δ', '\\delta'), ('ε', '\\epsilon'), ('θ', '\\theta'),
-            ('λ', '\\lambda'), ('μ', '\\mu'), ('π', '\\pi'),
-            ('σ', '\\sigma'), ('τ', '\\tau'), ('φ', '\\phi'),
-            ('ω', '\\omega'), ('Σ', '\\Sigma'), ('Δ', '\\Delta'),
-            ('Ω', '\\Omega'), ('→', '\\rightarrow'), ('←', '\\leftarrow'),
-            ('⇒', '\\Rightarrow'), ('⇔', '\\Leftrightarrow'),
-        ]
-        
-        latex = text
-        for old, new in replacements:
-            latex = latex.replace(old, new)
+        # Every symbol is one character - one translate() pass replaces them all
+        latex = text.translate(_SYMBOL_TABLE)
         
         # Detect and convert fractions
-        latex = re.sub(r'(\d+)\s*/\s*(\d+)', r'\\frac{\1}{\2}', latex)
+        latex = _FRAC_RE.sub(r'\\frac{\1}{\2}', latex)
         
         # Detect exponents
-        latex = re.sub(r'(\w+)\^(\d+)', r'\1^{\2}', latex)
-        latex = re.sub(r'(\w+)_(\d+)', r'\1_{\2}', latex)
+        latex = _SUP_RE.sub(r'\1^{\2}', latex)
+        latex = _SUB_RE.sub(r'\1_{\2}', latex)
         
         return latex
     
-    def _is_inline_math(self, math_elem, ns: Dict) -> bool:
-        """Check if math element is inline or display."""
-        parent = math_elem.getparent()
-        if parent is not None and parent.tag.endswith('oMathPara'):
-            return False
-        return True
-    
-    def _extract_latex_equations(self, docx_path: Path) -> List[Dict]:
-        """Extract LaTeX equations with positions."""
+    def _extract_latex_equations(self, docx_path: Path, raw_text: str = None) -> List[Dict]:
+        """Extract LaTeX equations with positions.
+        
+        raw_text is the document text already collected by the Office Math
+        pass; it is read from document.xml when not given.
+        """
         equations = []
         
         try:
-            import mammoth
-            with open(docx_path, "rb") as f:
-                raw_result = mammoth.extract_raw_text(f)
-                raw_text = raw_result.value
+            if raw_text is None:
+                parts = []
+                with zipfile.ZipFile(docx_path, 'r') as zip_file:
+                    with zip_file.open('word/document.xml') as xml_file:
+                        for para in _iter_body_paragraphs(xml_file):
+                            _append_raw_text(para, parts)
+                raw_text = ''.join(parts)
             
             # Find all LaTeX patterns with positions
-            patterns = [
-                (r'\$\$([^$]+)\$\$', 'display'),
-                (r'\$([^$\n]+)\$', 'inline'),
-                (r'\\\[([^\]]+)\\\]', 'display'),
-                (r'\\\(([^\)]+)\\\)', 'inline')
-            ]
-            
-            for pattern, eq_type in patterns:
-                for match in re.finditer(pattern, raw_text):
-                    equations.append({
-                        'id': f"latex_{len(equations)}",
-                        'type': eq_type,
-                        'latex': match.group(0),
-                        'content': match.group(1),
-                        'position': match.start(),
-                        'anchor': f"equation-latex-{len(equations)}"
-                    })
+            for idx, match in enumerate(_LATEX_EQ_RE.finditer(raw_text)):
+                kind = match.lastgroup
+                num = str(idx)
+                equations.append({
+                    'id': 'latex_' + num,
+                    'type': _LATEX_EQ_TYPES[kind],
+                    'latex': match.group(0),
+                    'content': match.group(kind),
+                    'position': match.start(),
+                    'anchor': 'equation-latex-' + num
+                })
             
         except Exception as e:
             self.logger.debug(f"Error extracting LaTeX: {e}")
         
         return equations
     
-    def _extract_equation_images(self, docx_path: Path) -> List[Dict]:
+    def _extract_equation_images(self, docx_path: Path,
+                                 zip_file: zipfile.ZipFile = None) -> List[Dict]:
         """Extract equation images (for equations inserted as images)."""
         equation_images = []
         
         try:
-            with zipfile.ZipFile(docx_path, 'r') as zip_file:
+            with _open_docx(docx_path, zip_file) as zip_file:
                 # Check relationships for equation images
-                if 'word/_rels/document.xml.rels' in zip_file.namelist():
+                if 'word/_rels/document.xml.rels' in zip_file.NameToInfo:
                     with zip_file.open('word/_rels/document.xml.rels') as rels_file:
-                        tree = ET.parse(rels_file)
-                        root = tree.getroot()
+                        root = etree.parse(rels_file)
                         
-                        ns = {'r': 'http://schemas.openxmlformats.org/package/2006/relationships'}
-                        
-                        for rel in root.findall('.//r:Relationship', ns):
-                            target = rel.get('Target')
-                            if target and 'media/' in target:
-                                # Check if image might be an equation
-                                if any(kw in target.lower() for kw in ['equation', 'eq', 'formula']):
-                                    equation_images.append({
-                                        'id': f"img_eq_{len(equation_images)}",
-                                        'path': target,
-                                        'anchor': f"equation-img-{len(equation_images)}"
-                                    })
+                        # Media targets that might be equations, filtered by libxml2
+                        for idx, target in enumerate(_EQ_IMAGE_TARGETS(root)):
+                            num = str(idx)
+                            equation_images.append({
+                                'id': 'img_eq_' + num,
+                                'path': str(target),
+                                'anchor': 'equation-img-' + num
+                            })
         
         except Exception as e:
             self.logger.debug(f"Error extracting equation images: {e}")
@@ -247,31 +495,45 @@ class EquationProcessor:
         """Add equation anchors to HTML content."""
         modified_html = html_content
         
-        # Add anchors for Office Math equations
-        for eq in equations.get('office_math', []):
-            anchor = f'<a id="{eq["anchor"]}" class="equation-anchor"></a>'
+        # Add anchors for Office Math equations - only when the HTML has
+        # markers at all, then every marker is replaced in one pass
+        if '[EQUATION_' in modified_html:
+            # Replace equation markers if they exist (first equation wins)
+            by_marker = {}
+            for eq in equations.get('office_math', []):
+                by_marker.setdefault(f"[EQUATION_{eq['id']}]", eq)
             
-            # Try to insert anchor near equation content
-            if eq['type'] == 'display':
-                # For display equations, wrap in div with anchor
-                eq_html = f'{anchor}<div class="equation display-equation">$${eq["latex"]}$$</div>'
-            else:
+            def equation_html(match):
+                eq = by_marker.get(match.group(0))
+                if eq is None:
+                    return match.group(0)
+                
+                anchor = f'<a id="{eq["anchor"]}" class="equation-anchor"></a>'
+                
+                # Try to insert anchor near equation content
+                if eq['type'] == 'display':
+                    # For display equations, wrap in div with anchor
+                    return f'{anchor}<div class="equation display-equation">$${eq["latex"]}$$</div>'
                 # For inline equations
-                eq_html = f'{anchor}<span class="equation inline-equation">${eq["latex"]}$</span>'
+                return f'{anchor}<span class="equation inline-equation">${eq["latex"]}$</span>'
             
-            # Replace equation markers if they exist
-            marker = f"[EQUATION_{eq['id']}]"
-            if marker in modified_html:
-                modified_html = modified_html.replace(marker, eq_html)
+            modified_html = _EQ_MARKER_RE.sub(equation_html, modified_html)
         
-        # Add anchors for LaTeX equations
+        # Add anchors for LaTeX equations - every anchor for the same LaTeX
+        # goes in front of its first occurrence
+        latex_anchors = {}
         for eq in equations.get('latex', []):
             anchor = f'<a id="{eq["anchor"]}" class="equation-anchor"></a>'
+            latex_anchors[eq['latex']] = latex_anchors.get(eq['latex'], '') + anchor
+        
+        if latex_anchors:
+            latex_re = _alternation_re(latex_anchors)
+            
+            def insert_anchor(match):
+                original = match.group(0)
+                return latex_anchors.pop(original, '') + original
             
-            # Find and replace the LaTeX equation with anchor
-            original = eq['latex']
-            replacement = f'{anchor}{original}'
-            modified_html = modified_html.replace(original, replacement, 1)
+            modified_html = latex_re.sub(insert_anchor, modified_html)
         
         return modified_html
 
@@ -279,14 +541,39 @@ class EquationProcessor:
 # document_creator.py
 """Create Word documents with special anchors for equations and images."""
 
+import json
 import logging
 from pathlib import Path
 from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
 from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from typing import List, Dict, Optional
 import re
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Attribute names set on every bookmark / hyperlink
+W_ID = qn('w:id')
+W_NAME = qn('w:name')
+W_VAL = qn('w:val')
+W_ANCHOR = qn('w:anchor')
+
+# Any equation delimiter - one scan instead of one search per pattern
+_CONTAINS_EQ_RE = re.compile(r'\$[^$]+\$|\$\$[^$]+\$\$|\\\[|\\\(')
+
+# Equation extraction, in priority order
+_EXTRACT_EQ_PATTERNS = [
+    re.compile(r'(\$\$[^$]+\$\$)'),
+    re.compile(r'(\$[^$]+\$)'),
+    re.compile(r'(\\\[[^\]]+\\\])'),
+    re.compile(r'(\\\([^\)]+\\\))')
+]
+
 class DocumentCreatorWithAnchors:
     """Create Word documents with special anchors for equations and images."""
     
@@ -397,17 +684,16 @@ class DocumentCreatorWithAnchors:
     
     def _add_bookmark(self, paragraph, bookmark_name: str):
         """Add bookmark (anchor) to paragraph."""
-        from docx.oxml import OxmlElement
-        from docx.oxml.ns import qn
+        bookmark_id = str(len(self.anchor_registry))
         
         # Create bookmark start element
         bookmark_start = OxmlElement('w:bookmarkStart')
-        bookmark_start.set(qn('w:id'), str(len(self.anchor_registry)))
-        bookmark_start.set(qn('w:name'), bookmark_name)
+        bookmark_start.set(W_ID, bookmark_id)
+        bookmark_start.set(W_NAME, bookmark_name)
         
         # Create bookmark end element
         bookmark_end = OxmlElement('w:bookmarkEnd')
-        bookmark_end.set(qn('w:id'), str(len(self.anchor_registry)))
+        bookmark_end.set(W_ID, bookmark_id)
         
         # Add to paragraph
         paragraph._p.append(bookmark_start)
@@ -421,16 +707,11 @@ class DocumentCreatorWithAnchors:
         table = self.doc.add_table(rows=len(data), cols=len(data[0]))
         table.style = 'Table Grid'
         
-        for row_idx, row_data in enumerate(data):
-            for col_idx, cell_text in enumerate(row_data):
-                cell = table.rows[row_idx].cells[col_idx]
-                
-                # Check if cell contains equation
-                if self._contains_equation(cell_text):
-                    # Extract equation
-                    equation = self._extract_equation(cell_text)
-                    clean_text = cell_text.replace(equation, "")
-                    
+        for row_idx, (row, row_data) in enumerate(zip(table.rows, data)):
+            for col_idx, (cell, cell_text) in enumerate(zip(row.cells, row_data)):
+                # Check if cell contains equation, and extract it
+                equation, clean_text = self._split_equation(cell_text)
+                if equation is not None:
                     # Add with anchor
                     para = cell.paragraphs[0]
                     para.text = clean_text
@@ -462,26 +743,25 @@ class DocumentCreatorWithAnchors:
         
         return anchor_ids
     
-    def _contains_equation(self, text: str) -> bool:
-        """Check if text contains equation patterns."""
-        patterns = [r'\$[^$]+\$', r'\$\$[^$]+\$\$', r'\\\[', r'\\\(']
-        return any(re.search(pattern, text) for pattern in patterns)
-    
-    def _extract_equation(self, text: str) -> str:
-        """Extract equation from text."""
-        patterns = [
-            (r'(\$\$[^$]+\$\$)', 1),
-            (r'(\$[^$]+\$)', 1),
-            (r'(\\\[[^\]]+\\\])', 1),
-            (r'(\\\([^\)]+\\\))', 1)
-        ]
-        
-        for pattern, group in patterns:
-            match = re.search(pattern, text)
+    def _split_equation(self, text: str):
+        """Return (equation, text without it), or (None, text) if there is none."""
+        # Every delimiter needs a '$' or a backslash - plain cells skip the regex
+        if '$' not in text and '\\' not in text:
+            return None, text
+        
+        found = _CONTAINS_EQ_RE.search(text)
+        if found is None:
+            return None, text
+        
+        # No equation can start before the first delimiter
+        start = found.start()
+        for pattern in _EXTRACT_EQ_PATTERNS:
+            match = pattern.search(text, start)
             if match:
-                return match.group(group)
+                equation = match.group(1)
+                return equation, text.replace(equation, "")
         
-        return ""
+        return "", text
     
     def add_references_with_links(self, references: List[Dict[str, str]]):
         """Add references section with links to anchors."""
@@ -502,12 +782,9 @@ class DocumentCreatorWithAnchors:
     
     def _add_internal_hyperlink(self, paragraph, bookmark_name: str, text: str):
         """Add internal hyperlink to bookmark."""
-        from docx.oxml import OxmlElement
-        from docx.oxml.ns import qn
-        
         # Create hyperlink element
         hyperlink = OxmlElement('w:hyperlink')
-        hyperlink.set(qn('w:anchor'), bookmark_name)
+        hyperlink.set(W_ANCHOR, bookmark_name)
         
         # Create run with text
         run = OxmlElement('w:r')
@@ -515,11 +792,11 @@ class DocumentCreatorWithAnchors:
         
         # Add blue color and underline
         color = OxmlElement('w:color')
-        color.set(qn('w:val'), '0000FF')
+        color.set(W_VAL, '0000FF')
         run_properties.append(color)
         
         underline = OxmlElement('w:u')
-        underline.set(qn('w:val'), 'single')
+        underline.set(W_VAL, 'single')
         run_properties.append(underline)
         
         run.append(run_properties)
@@ -539,10 +816,13 @@ class DocumentCreatorWithAnchors:
             self.doc.save(output_path)
             
             # Save anchor registry as companion file
-            import json
             registry_path = output_path.with_suffix('.anchors.json')
-            with open(registry_path, 'w', encoding='utf-8') as f:
-                json.dump(self.anchor_registry, f, indent=2, ensure_ascii=False)
+            if orjson is not None:
+                registry_path.write_bytes(orjson.dumps(
+                    self.anchor_registry, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            else:
+                with open(registry_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.anchor_registry, f, indent=2, ensure_ascii=False)
             
             self.logger.info(f"Document saved to {output_path}")
             self.logger.info(f"Anchor registry saved to {registry_path}")
@@ -5,6 +5,11 @@ import re
 import logging
 from typing import Tuple, List
 
+# Delimiter patterns, compiled once
+_SINGLE_DOLLAR_RE = re.compile(r'(?<![\\$])\$(?![\\$])')
+_DOUBLE_DOLLAR_RE = re.compile(r'\$\$')
+_WHITESPACE_RE = re.compile(r'\s+')
+
 class EquationHandler:
     """Handles LaTeX equation processing."""
     
@@ -23,12 +28,14 @@ class EquationHandler:
     
     def _fix_equation_delimiters(self, text: str) -> str:
         """Fix common delimiter issues."""
-        # Ensure proper spacing around delimiters
-        text = re.sub(r'(?<![\\$])\$(?![\\$])', ' $ ', text)
-        text = re.sub(r'\$\$', ' $$ ', text)
+        # Ensure proper spacing around delimiters (text without a '$' has none)
+        if '$' in text:
+            text = _SINGLE_DOLLAR_RE.sub(' $ ', text)
+            if '$$' in text:
+                text = _DOUBLE_DOLLAR_RE.sub(' $$ ', text)
         
         # Clean up multiple spaces
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         
         return text
 
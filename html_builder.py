@@ -6,85 +6,121 @@ from pathlib import Path
 from models import DocumentContent
 from config import Config
 
-class HTMLBuilder:
-    """Handles HTML generation."""
-    
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
-    
-    def build_html(self, content: DocumentContent, output_path: Path) -> None:
-        """Build complete HTML file."""
-        # Create MathJax or KaTeX script based on config
-        math_script = self._get_math_script()
-        
-        # Build HTML
-        html = f"""<!DOCTYPE html>
-<html lang="ar" dir="rtl">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{content.title}</title>
-    <meta name="author" content="{content.author}">
-    {math_script}
-    <style>
-        body {{
+# Static page pieces, built once at import
+_MATHJAX_SCRIPT = """
+    <script>
+        window.MathJax = {
+            tex: {
+                inlineMath: [['$', '$'], ['\\\\(', '\\\\)']],
+                displayMath: [['$$', '$$'], ['\\\\[', '\\\\]']],
+                processEscapes: true
+            },
+            options: {
+                skipHtmlTags: ['script', 'noscript', 'style', 'textarea', 'pre']
+            }
+        };
+    </script>
+    <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml.js"></script>
+"""
+
+_KATEX_SCRIPT = """
+    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/katex@0.16.0/dist/katex.min.css">
+    <script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.0/dist/katex.min.js"></script>
+    <script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.0/dist/contrib/auto-render.min.js"
+        onload="renderMathInElement(document.body, {
+            delimiters: [
+                {left: '$$', right: '$$', display: true},
+                {left: '$', right: '$', display: false},
+                {left: '\\\\(', right: '\\\\)', display: false},
+                {left: '\\\\[', right: '\\\\]', display: true}
+            ]
+        });"></script>
+"""
+
+_PAGE_STYLES = """
+        body {
             font-family: 'Arial', 'Tahoma', sans-serif;
             line-height: 1.8;
             max-width: 800px;
             margin: 0 auto;
             padding: 20px;
             direction: rtl;
-        }}
-        h1, h2, h3, h4 {{
+        }
+        h1, h2, h3, h4 {
             color: #333;
             margin-top: 1.5em;
-        }}
-        .title {{
+        }
+        .title {
             text-align: center;
             font-size: 2em;
             margin-bottom: 0.5em;
-        }}
-        .author {{
+        }
+        .author {
             text-align: center;
             color: #666;
             margin-bottom: 2em;
-        }}
-        .footnote {{
+        }
+        .footnote {
             font-size: 0.9em;
             color: #666;
             border-top: 1px solid #ddd;
             margin-top: 2em;
             padding-top: 1em;
-        }}
-        .footnote-ref {{
+        }
+        .footnote-ref {
             vertical-align: super;
             font-size: 0.8em;
             color: #0066cc;
             text-decoration: none;
-        }}
-        table {{
+        }
+        table {
             border-collapse: collapse;
             width: 100%;
             margin: 1em 0;
-        }}
-        td, th {{
+        }
+        td, th {
             border: 1px solid #ddd;
             padding: 8px;
             text-align: right;
-        }}
-        img {{
+        }
+        img {
             max-width: 100%;
             height: auto;
             display: block;
             margin: 1em auto;
-        }}
-        .image-caption {{
+        }
+        .image-caption {
             text-align: center;
             font-style: italic;
             color: #666;
             margin-top: 0.5em;
-        }}
-    </style>
+        }
+    """
+
+class HTMLBuilder:
+    """Handles HTML generation."""
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+    
+    def build_html(self, content: DocumentContent, output_path: Path) -> None:
+        """Build complete HTML file."""
+        # Create MathJax or KaTeX script based on config
+        math_script = self._get_math_script()
+        
+        # Add footnotes section if present
+        footnotes_html = self._build_footnotes_html(content.footnotes)
+        
+        # Build HTML - only the per-document fields are filled in
+        html = f"""<!DOCTYPE html>
+<html lang="ar" dir="rtl">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{content.title}</title>
+    <meta name="author" content="{content.author}">
+    {math_script}
+    <style>{_PAGE_STYLES}</style>
 </head>
 <body>
     <h1 class="title">{content.title}</h1>
@@ -93,13 +129,7 @@ class HTMLBuilder:
     <div class="content">
         {content.body_html}
     </div>
-"""
-        
-        # Add footnotes section if present
-        if content.footnotes:
-            html += self._build_footnotes_html(content.footnotes)
-        
-        html += """
+{footnotes_html}
 </body>
 </html>"""
         
@@ -110,46 +140,14 @@ class HTMLBuilder:
     
     def _get_math_script(self) -> str:
         """Get math rendering script based on config."""
-        if Config.USE_MATHJAX:
-            return """
-    <script>
-        window.MathJax = {
-            tex: {
-                inlineMath: [['$', '$'], ['\\\\(', '\\\\)']],
-                displayMath: [['$$', '$$'], ['\\\\[', '\\\\]']],
-                processEscapes: true
-            },
-            options: {
-                skipHtmlTags: ['script', 'noscript', 'style', 'textarea', 'pre']
-            }
-        };
-    </script>
-    <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml.js"></script>
-"""
-        else:
-            return """
-    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/katex@0.16.0/dist/katex.min.css">
-    <script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.0/dist/katex.min.js"></script>
-    <script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.0/dist/contrib/auto-render.min.js"
-        onload="renderMathInElement(document.body, {
-            delimiters: [
-                {left: '$$', right: '$$', display: true},
-                {left: '$', right: '$', display: false},
-                {left: '\\\\(', right: '\\\\)', display: false},
-                {left: '\\\\[', right: '\\\\]', display: true}
-            ]
-        });"></script>
-"""
+        return _MATHJAX_SCRIPT if Config.USE_MATHJAX else _KATEX_SCRIPT
     
     def _build_footnotes_html(self, footnotes) -> str:
         """Build HTML for footnotes section."""
         if not footnotes:
             return ""
         
-        html = '\n<div class="footnotes">\n<h3>الحواشي</h3>\n<ol>\n'
-        
-        for footnote in footnotes:
-            html += f'<li id="fn{footnote.id}">{footnote.text}</li>\n'
-        
-        html += '</ol>\n</div>\n'
-        return html
+        parts = ['\n<div class="footnotes">\n<h3>الحواشي</h3>\n<ol>\n']
+        parts.extend([f'<li id="fn{footnote.id}">{footnote.text}</li>\n' for footnote in footnotes])
+        parts.append('</ol>\n</div>\n')
+        return ''.join(parts)
@@ -10,191 +10,35 @@ from typing import Dict, Optional, Tuple
 from enhanced_equation_handler import EquationProcessor
 from document_creator import DocumentCreatorWithAnchors
 
-class IntegratedMammothConverter:
-    """Enhanced mammoth converter with fixed equation handling and anchor support."""
-    
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        self.equation_processor = EquationProcessor()
-        self.style_map = """
-        p[style-name='Heading 1'] => h1:fresh
-        p[style-name='Heading 2'] => h2:fresh
-        p[style-name='Heading 3'] => h3:fresh
-        p[style-name='Title'] => h1.title:fresh
-        p[style-name='Subtitle'] => h2.subtitle:fresh
-        r[style-name='Strong'] => strong
-        r[style-name='Emphasis'] => em
-        """
-        
-    def convert_with_equation_fix(self, docx_path: Path, output_path: Path) -> Tuple[str, Dict]:
-        """Convert document with proper equation handling and anchor generation."""
-        
-        self.logger.info(f"Converting {docx_path.name} with enhanced equation handling...")
-        
-        # Step 1: Extract all equations first
-        equations = self.equation_processor.extract_all_equations(docx_path)
-        total_equations = (len(equations['office_math']) + 
-                          len(equations['latex']) + 
-                          len(equations['images']))
-        
-        self.logger.info(f"Found {total_equations} equations total:")
-        self.logger.info(f"  - Office Math: {len(equations['office_math'])}")
-        self.logger.info(f"  - LaTeX: {len(equations['latex'])}")
-        self.logger.info(f"  - Equation Images: {len(equations['images'])}")
-        
-        # Step 2: Pre-process document for equation markers
-        processed_doc_path = self._preprocess_document(docx_path, equations)
-        
-        # Step 3: Convert with mammoth
-        html_content = self._convert_with_mammoth(processed_doc_path)
-        
-        # Step 4: Post-process HTML to fix equations
-        html_content = self._postprocess_equations(html_content, equations)
-        
-        # Step 5: Add anchors to equations and images
-        html_content = self.equation_processor.create_html_with_anchors(html_content, equations)
-        
-        # Step 6: Build complete HTML document
-        complete_html = self._build_enhanced_html(html_content, equations)
-        
-        # Step 7: Save HTML
-        output_path.write_text(complete_html, encoding='utf-8')
-        self.logger.info(f"Saved converted document to {output_path}")
-        
-        # Return HTML and equation data for further processing
-        return complete_html, equations
-    
-    def _preprocess_document(self, docx_path: Path, equations: Dict) -> Path:
-        """Pre-process document to add equation markers."""
-        import tempfile
-        import shutil
-        
-        # Create temporary copy
-        temp_file = tempfile.NamedTemporaryFile(suffix='.docx', delete=False)
-        shutil.copy2(docx_path, temp_file.name)
-        temp_path = Path(temp_file.name)
-        
-        try:
-            doc = docx.Document(temp_path)
-            
-            # Process each paragraph
-            for para_idx, paragraph in enumerate(doc.paragraphs):
-                para_text = paragraph.text
-                
-                # Check for Office Math equations in this paragraph
-                para_equations = [eq for eq in equations['office_math'] 
-                                 if eq['paragraph'] == para_idx + 1]
-                
-                if para_equations:
-                    # Clear paragraph and rebuild with markers
-                    new_runs = []
-                    
-                    for eq in para_equations:
-                        marker = f"[EQ_MARKER_{eq['id']}]"
-                        new_runs.append(marker)
-                    
-                    # Clear existing runs
-                    for run in paragraph.runs:
-                        run.text = ""
-                    
-                    # Add text with markers
-                    if para_text.strip():
-                        paragraph.add_run(para_text + " ")
-                    
-                    for marker in new_runs:
-                        paragraph.add_run(marker + " ")
-            
-            doc.save(temp_path)
-            
-        except Exception as e:
-            self.logger.error(f"Error in preprocessing: {e}")
-        
-        return temp_path
-    
-    def _convert_with_mammoth(self, docx_path: Path) -> str:
-        """Convert document with mammoth."""
-        try:
-            with open(docx_path, "rb") as docx_file:
-                result = mammoth.convert_to_html(
-                    docx_file,
-                    style_map=self.style_map,
-                    ignore_empty_paragraphs=False
-                )
-            
-            # Log warnings but filter out equation-related ones
-            if result.messages:
-                for msg in result.messages:
-                    msg_str = str(msg)
-                    if not any(term in msg_str.lower() for term in ['omath', 'equation', 'formula']):
-                        self.logger.warning(f"Mammoth warning: {msg}")
-            
-            return result.value
-            
-        except Exception as e:
-            self.logger.error(f"Error in mammoth conversion: {e}")
-            return ""
-    
-    def _postprocess_equations(self, html_content: str, equations: Dict) -> str:
-        """Post-process HTML to properly format equations."""
-        
-        # Replace Office Math markers
-        for eq in equations['office_math']:
-            marker = f"[EQ_MARKER_{eq['id']}]"
-            
-            if eq['type'] == 'display':
-                replacement = f'<div class="equation display-math" data-anchor="{eq["anchor"]}">$${eq["latex"]}$$</div>'
-            else:
-                replacement = f'<span class="equation inline-math" data-anchor="{eq["anchor"]}">${eq["latex"]}$</span>'
-            
-            html_content = html_content.replace(marker, replacement)
-        
-        # Fix LaTeX equations that might have been escaped
-        html_content = self._fix_latex_escaping(html_content)
-        
-        # Ensure proper spacing around equations
-        html_content = re.sub(r'([.!?])\s*(\$\$[^$]+\$\$)', r'\1</p><p>\2', html_content)
-        html_content = re.sub(r'(\$\$[^$]+\$\$)\s*([A-Z])', r'\1</p><p>\2', html_content)
-        
-        return html_content
-    
-    def _fix_latex_escaping(self, html: str) -> str:
-        """Fix common LaTeX escaping issues."""
-        fixes = [
-            # Fix escaped dollar signs
-            (r'\\\$', '$'),
-            # Fix double backslashes
-            (r'\\\\([a-zA-Z])', r'\\\1'),
-            # Fix HTML entities in equations
-            (r'&lt;', '<'),
-            (r'&gt;', '>'),
-            (r'&amp;', '&'),
-            # Fix spaces in equations
-            (r'\$\s+([^$]+?)\s+\$', r'$\1$'),
-            (r'\$\$\s+([^$]+?)\s+\$\$', r'$$\1$$'),
-        ]
-        
-        for pattern, replacement in fixes:
-            html = re.sub(pattern, replacement, html)
-        
-        # Special handling for equation blocks
-        def fix_equation_block(match):
-            eq_content = match.group(1)
-            # Remove extra spaces and line breaks
-            eq_content = ' '.join(eq_content.split())
-            return f'$${eq_content}$$'
-        
-        html = re.sub(r'\$\$(.*?)\$\$', fix_equation_block, html, flags=re.DOTALL)
-        
-        return html
-    
-    def _build_enhanced_html(self, body_html: str, equations: Dict) -> str:
-        """Build complete HTML with enhanced equation support."""
-        
-        # Determine if we need MathJax
-        has_equations = any(len(equations[key]) > 0 for key in equations)
-        
-        # MathJax configuration
-        mathjax_config = """
+# Equation clean-up patterns, compiled once
+_RE_EQ_MARKER = re.compile(r'\[EQ_MARKER_([^\[\]]*)\]')
+_RE_EQ_AFTER_PUNCT = re.compile(r'([.!?])\s*(\$\$[^$]+\$\$)')
+_RE_EQ_BEFORE_UPPER = re.compile(r'(\$\$[^$]+\$\$)\s*([A-Z])')
+_RE_EQ_BLOCK = re.compile(r'\$\$(.*?)\$\$', re.DOTALL)
+
+# HTML entities in equations - all three in one pass
+_HTML_ENTITIES = {'&lt;': '<', '&gt;': '>', '&amp;': '&'}
+_RE_HTML_ENTITY = re.compile(r'&(?:lt|gt|amp);')
+
+_LATEX_FIXES = [
+    # Fix escaped dollar signs
+    (re.compile(r'\\\$'), '$'),
+    # Fix double backslashes
+    (re.compile(r'\\\\([a-zA-Z])'), r'\\\1'),
+    # Fix HTML entities in equations
+    (_RE_HTML_ENTITY, lambda match: _HTML_ENTITIES[match.group()]),
+    # Fix spaces in equations
+    (re.compile(r'\$\s+([^$]+?)\s+\$'), r'$\1$'),
+    (re.compile(r'\$\$\s+([^$]+?)\s+\$\$'), r'$$\1$$'),
+]
+
+def _fix_equation_block(match) -> str:
+    """Remove extra spaces and line breaks inside a $$...$$ block."""
+    eq_content = ' '.join(match.group(1).split())
+    return f'$${eq_content}$$'
+
+# Static pieces of the enhanced page, built once at import
+_MATHJAX_CONFIG = """
     <script>
         window.MathJax = {
             tex: {
@@ -221,10 +65,10 @@ class IntegratedMammothConverter:
         };
     </script>
     <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"></script>
-""" if has_equations else ""
-        
-        # Enhanced CSS for equations and anchors
-        enhanced_css = """
+"""
+
+# Enhanced CSS for equations and anchors
+_ENHANCED_CSS = """
         /* Equation styles */
         .equation {
             margin: 0.5em 0;
@@ -294,8 +138,10 @@ class IntegratedMammothConverter:
             }
         }
 """
-        
-        return f"""<!DOCTYPE html>
+
+def _page_head(mathjax_config: str) -> str:
+    """Everything before the body content, with or without MathJax."""
+    return f"""<!DOCTYPE html>
 <html lang="ar" dir="rtl">
 <head>
     <meta charset="UTF-8">
@@ -327,7 +173,7 @@ class IntegratedMammothConverter:
             color: #0066cc;
         }}
         
-        {enhanced_css}
+        {_ENHANCED_CSS}
         
         /* Table styles */
         table {{
@@ -358,36 +204,211 @@ class IntegratedMammothConverter:
 </head>
 <body>
     <div class="content">
-        {body_html}
+        """
+
+_PAGE_HEAD_MATHJAX = _page_head(_MATHJAX_CONFIG)
+_PAGE_HEAD_PLAIN = _page_head("")
+
+_PAGE_TAIL = """
     </div>
     
     <!-- Equation error handler -->
     <script>
         // Handle MathJax errors
-        window.addEventListener('load', function() {{
-            if (window.MathJax) {{
-                MathJax.startup.document.addEventListener('math error', function(e) {{
+        window.addEventListener('load', function() {
+            if (window.MathJax) {
+                MathJax.startup.document.addEventListener('math error', function(e) {
                     console.error('MathJax error:', e);
                     const el = e.target;
                     el.classList.add('equation-error');
                     el.title = 'Error rendering equation: ' + e.message;
-                }});
-            }}
-        }});
+                });
+            }
+        });
         
         // Add equation numbering
-        document.addEventListener('DOMContentLoaded', function() {{
+        document.addEventListener('DOMContentLoaded', function() {
             const displayEquations = document.querySelectorAll('.display-math');
-            displayEquations.forEach((eq, index) => {{
+            displayEquations.forEach((eq, index) => {
                 const number = document.createElement('span');
                 number.className = 'equation-number';
-                number.textContent = `({{index + 1}})`;
+                number.textContent = `({index + 1})`;
                 eq.appendChild(number);
-            }});
-        }});
+            });
+        });
     </script>
 </body>
 </html>"""
+
+class IntegratedMammothConverter:
+    """Enhanced mammoth converter with fixed equation handling and anchor support."""
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.equation_processor = EquationProcessor()
+        self.style_map = """
+        p[style-name='Heading 1'] => h1:fresh
+        p[style-name='Heading 2'] => h2:fresh
+        p[style-name='Heading 3'] => h3:fresh
+        p[style-name='Title'] => h1.title:fresh
+        p[style-name='Subtitle'] => h2.subtitle:fresh
+        r[style-name='Strong'] => strong
+        r[style-name='Emphasis'] => em
+        """
+        
+    def convert_with_equation_fix(self, docx_path: Path, output_path: Path) -> Tuple[str, Dict]:
+        """Convert document with proper equation handling and anchor generation."""
+        
+        self.logger.info(f"Converting {docx_path.name} with enhanced equation handling...")
+        
+        # Step 1: Extract all equations first
+        equations = self.equation_processor.extract_all_equations(docx_path)
+        total_equations = (len(equations['office_math']) + 
+                          len(equations['latex']) + 
+                          len(equations['images']))
+        
+        self.logger.info(f"Found {total_equations} equations total:")
+        self.logger.info(f"  - Office Math: {len(equations['office_math'])}")
+        self.logger.info(f"  - LaTeX: {len(equations['latex'])}")
+        self.logger.info(f"  - Equation Images: {len(equations['images'])}")
+        
+        # Step 2: Pre-process document for equation markers
+        processed_doc_path = self._preprocess_document(docx_path, equations)
+        
+        # Step 3: Convert with mammoth
+        html_content = self._convert_with_mammoth(processed_doc_path)
+        
+        # Step 4: Post-process HTML to fix equations
+        html_content = self._postprocess_equations(html_content, equations)
+        
+        # Step 5: Add anchors to equations and images
+        html_content = self.equation_processor.create_html_with_anchors(html_content, equations)
+        
+        # Step 6: Build complete HTML document
+        complete_html = self._build_enhanced_html(html_content, equations)
+        
+        # Step 7: Save HTML
+        output_path.write_text(complete_html, encoding='utf-8')
+        self.logger.info(f"Saved converted document to {output_path}")
+        
+        # Return HTML and equation data for further processing
+        return complete_html, equations
+    
+    def _preprocess_document(self, docx_path: Path, equations: Dict) -> Path:
+        """Pre-process document to add equation markers."""
+        import tempfile
+        import shutil
+        
+        # Create temporary copy
+        temp_file = tempfile.NamedTemporaryFile(suffix='.docx', delete=False)
+        shutil.copy2(docx_path, temp_file.name)
+        temp_path = Path(temp_file.name)
+        
+        try:
+            doc = docx.Document(temp_path)
+            
+            # Process each paragraph
+            for para_idx, paragraph in enumerate(doc.paragraphs):
+                para_text = paragraph.text
+                
+                # Check for Office Math equations in this paragraph
+                para_equations = [eq for eq in equations['office_math'] 
+                                 if eq['paragraph'] == para_idx + 1]
+                
+                if para_equations:
+                    # Clear paragraph and rebuild with markers
+                    new_runs = []
+                    
+                    for eq in para_equations:
+                        marker = f"[EQ_MARKER_{eq['id']}]"
+                        new_runs.append(marker)
+                    
+                    # Clear existing runs
+                    for run in paragraph.runs:
+                        run.text = ""
+                    
+                    # Add text with markers
+                    if para_text.strip():
+                        paragraph.add_run(para_text + " ")
+                    
+                    for marker in new_runs:
+                        paragraph.add_run(marker + " ")
+            
+            doc.save(temp_path)
+            
+        except Exception as e:
+            self.logger.error(f"Error in preprocessing: {e}")
+        
+        return temp_path
+    
+    def _convert_with_mammoth(self, docx_path: Path) -> str:
+        """Convert document with mammoth."""
+        try:
+            with open(docx_path, "rb") as docx_file:
+                result = mammoth.convert_to_html(
+                    docx_file,
+                    style_map=self.style_map,
+                    ignore_empty_paragraphs=False
+                )
+            
+            # Log warnings but filter out equation-related ones
+            if result.messages:
+                for msg in result.messages:
+                    msg_str = str(msg)
+                    if not any(term in msg_str.lower() for term in ['omath', 'equation', 'formula']):
+                        self.logger.warning(f"Mammoth warning: {msg}")
+            
+            return result.value
+            
+        except Exception as e:
+            self.logger.error(f"Error in mammoth conversion: {e}")
+            return ""
+    
+    def _postprocess_equations(self, html_content: str, equations: Dict) -> str:
+        """Post-process HTML to properly format equations."""
+        
+        # Replace Office Math markers - one scan of the HTML for all of them
+        if '[EQ_MARKER_' in html_content:
+            replacements = {}
+            for eq in equations['office_math']:
+                if eq['type'] == 'display':
+                    replacement = f'<div class="equation display-math" data-anchor="{eq["anchor"]}">$${eq["latex"]}$$</div>'
+                else:
+                    replacement = f'<span class="equation inline-math" data-anchor="{eq["anchor"]}">${eq["latex"]}$</span>'
+                
+                # The first equation with an id wins, as with sequential replaces
+                replacements.setdefault(str(eq['id']), replacement)
+            
+            html_content = _RE_EQ_MARKER.sub(
+                lambda match: replacements.get(match.group(1), match.group()), html_content)
+        
+        # Fix LaTeX equations that might have been escaped
+        html_content = self._fix_latex_escaping(html_content)
+        
+        # Ensure proper spacing around equations
+        html_content = _RE_EQ_AFTER_PUNCT.sub(r'\1</p><p>\2', html_content)
+        html_content = _RE_EQ_BEFORE_UPPER.sub(r'\1</p><p>\2', html_content)
+        
+        return html_content
+    
+    def _fix_latex_escaping(self, html: str) -> str:
+        """Fix common LaTeX escaping issues."""
+        for pattern, replacement in _LATEX_FIXES:
+            html = pattern.sub(replacement, html)
+        
+        # Special handling for equation blocks
+        html = _RE_EQ_BLOCK.sub(_fix_equation_block, html)
+        
+        return html
+    
+    def _build_enhanced_html(self, body_html: str, equations: Dict) -> str:
+        """Build complete HTML with enhanced equation support."""
+        
+        # Determine if we need MathJax
+        has_equations = any(len(equations[key]) > 0 for key in equations)
+        
+        head = _PAGE_HEAD_MATHJAX if has_equations else _PAGE_HEAD_PLAIN
+        return f"{head}{body_html}{_PAGE_TAIL}"
     
     def create_word_with_anchors(self, content_data: Dict, output_path: Path):
         """Create a Word document with anchors from converted content."""
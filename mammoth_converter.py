@@ -15,6 +15,249 @@ import os
 import json
 from config import Config
 
+# Static pieces of the article page, built once at import. Only the title,
+# author, math script and body are filled in per document.
+_MATH_SCRIPT = """
+    <!-- MathJax for equations -->
+    <script>
+        window.MathJax = {
+            tex: {
+                inlineMath: [['$', '$'], ['\\\\(', '\\\\)']],
+                displayMath: [['$$', '$$'], ['\\\\[', '\\\\]']],
+                processEscapes: true
+            },
+            svg: {
+                fontCache: 'global'
+            }
+        };
+    </script>
+    <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-svg.js"></script>
+"""
+
+_PAGE_STYLES = """
+        body {
+            font-family: 'Amiri', 'Arial', 'Tahoma', sans-serif;
+            line-height: 1.8;
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 20px;
+            direction: rtl;
+            text-align: right;
+            color: #333;
+        }
+        h1, h2, h3, h4 {
+            color: #1a1a1a;
+            margin-top: 1.5em;
+            margin-bottom: 0.5em;
+        }
+        .title {
+            text-align: center;
+            font-size: 2.5em;
+            margin-bottom: 0.2em;
+            color: #0066cc;
+        }
+        .subtitle {
+            text-align: center;
+            font-size: 1.5em;
+            color: #666;
+            margin-bottom: 1em;
+        }
+        .author {
+            text-align: center;
+            color: #666;
+            margin-bottom: 2em;
+            font-style: italic;
+        }
+        img {
+            max-width: 100%;
+            height: auto;
+            display: block;
+            margin: 1em auto;
+            border: 1px solid #ddd;
+            padding: 5px;
+            background: #fff;
+        }
+        .caption {
+            text-align: center;
+            font-style: italic;
+            color: #666;
+            font-size: 0.9em;
+            margin-top: -0.5em;
+            margin-bottom: 1em;
+        }
+        .table-wrapper {
+            overflow-x: auto;
+            margin: 1em 0;
+        }
+        table {
+            border-collapse: collapse;
+            width: 100%;
+            margin: 1em 0;
+            background: #fff;
+        }
+        td, th {
+            border: 1px solid #ddd;
+            padding: 8px;
+            text-align: right;
+        }
+        th {
+            background-color: #f5f5f5;
+            font-weight: bold;
+        }
+        tr:nth-child(even) {
+            background-color: #f9f9f9;
+        }
+        blockquote {
+            border-right: 4px solid #ddd;
+            margin: 1em 0;
+            padding-right: 1em;
+            color: #666;
+            font-style: italic;
+        }
+        /* Footnotes styling */
+        .footnotes {
+            margin-top: 3em;
+            border-top: 2px solid #ddd;
+            padding-top: 1em;
+            font-size: 0.9em;
+        }
+        sup {
+            font-size: 0.8em;
+            color: #0066cc;
+        }
+        .footnote-backlink {
+            text-decoration: none;
+            margin-right: 0.5em;
+            color: #0066cc;
+        }
+        /* Equations */
+        .office-math-equations {
+            margin-top: 2em;
+            padding: 1em;
+            background: #f9f9f9;
+            border-radius: 5px;
+        }
+        .equation {
+            margin: 0.5em 0;
+        }
+        .display-equation {
+            text-align: center;
+            margin: 1em 0;
+        }
+        .MathJax {
+            font-size: 1.1em;
+        }
+        /* Print styles */
+        @media print {
+            body {
+                margin: 0;
+                padding: 10mm;
+            }
+            .table-wrapper {
+                overflow: visible;
+            }
+        }
+    """
+
+# Extra styles / script for the enhanced page (anchors, equation numbering)
+_ANCHOR_STYLES = """
+        /* Anchor styles */
+        .equation-anchor {
+            display: inline-block;
+            width: 0;
+            height: 0;
+            visibility: hidden;
+        }
+        
+        .equation-anchor:target {
+            background: yellow;
+            padding: 5px;
+            visibility: visible;
+            width: auto;
+            height: auto;
+        }
+        
+        img[data-anchor] {
+            scroll-margin-top: 20px;
+        }
+        
+        img[data-anchor]:target {
+            border: 3px solid #0066cc !important;
+            box-shadow: 0 0 10px rgba(0, 102, 204, 0.5);
+        }
+        
+        /* Enhanced equation styles */
+        .equation {
+            position: relative;
+            margin: 0.5em 0;
+        }
+        
+        .display-math {
+            display: block;
+            text-align: center;
+            margin: 1em 0;
+            padding: 0.5em;
+            overflow-x: auto;
+        }
+        
+        .inline-math {
+            display: inline;
+            padding: 0 0.2em;
+        }
+        
+        /* Equation numbering */
+        .equation-number {
+            position: absolute;
+            right: 0;
+            color: #666;
+            font-size: 0.9em;
+        }
+        
+        /* Error handling for equations */
+        .equation-error {
+            color: red;
+            border: 1px solid red;
+            padding: 0.5em;
+            background: #ffe6e6;
+            font-family: monospace;
+        }
+"""
+
+_JS_ENHANCEMENTS = """
+    <!-- Enhanced JavaScript for equations and anchors -->
+    <script>
+        // Handle MathJax errors gracefully
+        document.addEventListener('DOMContentLoaded', function() {
+            if (window.MathJax) {
+                window.MathJax.startup.promise.catch(function (e) {
+                    console.error('MathJax startup failed:', e);
+                });
+            }
+            
+            // Add equation numbering
+            const displayEquations = document.querySelectorAll('.display-math');
+            displayEquations.forEach((eq, index) => {
+                if (!eq.querySelector('.equation-number')) {
+                    const number = document.createElement('span');
+                    number.className = 'equation-number';
+                    number.textContent = `(${index + 1})`;
+                    eq.appendChild(number);
+                }
+            });
+            
+            // Smooth scroll to anchors
+            if (window.location.hash) {
+                const target = document.querySelector(window.location.hash);
+                if (target) {
+                    setTimeout(() => {
+                        target.scrollIntoView({ behavior: 'smooth', block: 'center' });
+                    }, 500);
+                }
+            }
+        });
+    </script>
+"""
+
 class MammothConverter:
     """Enhanced converter using mammoth with all features."""
     
@@ -623,25 +866,24 @@ class MammothConverter:
     def _build_html_document(self, title, author, body_html, has_equations):
         """Build complete HTML document with all features (original version)."""
         # Choose math script based on content
-        math_script = ""
-        if has_equations:
-            math_script = """
-    <!-- MathJax for equations -->
-    <script>
-        window.MathJax = {
-            tex: {
-                inlineMath: [['$', '$'], ['\\\\(', '\\\\)']],
-                displayMath: [['$$', '$$'], ['\\\\[', '\\\\]']],
-                processEscapes: true
-            },
-            svg: {
-                fontCache: 'global'
-            }
-        };
-    </script>
-    <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-svg.js"></script>
-"""
-        
+        math_script = _MATH_SCRIPT if has_equations else ""
+        return self._assemble_html_document(title, author, body_html, math_script)
+
+    def _build_html_document_enhanced(self, title, author, body_html, has_equations):
+        """Enhanced HTML builder with anchor support."""
+        # Same MathJax script as the base page
+        math_script = _MATH_SCRIPT if has_equations else ""
+        
+        # Anchor styles go at the end of <style>, the JavaScript for equations
+        # and anchors before </body> - placed directly, no replace() passes
+        # over the finished document
+        return self._assemble_html_document(title, author, body_html, math_script,
+                                            extra_styles=f"{_ANCHOR_STYLES}\n    ",
+                                            extra_body=f"{_JS_ENHANCEMENTS}\n")
+
+    def _assemble_html_document(self, title, author, body_html, math_script,
+                                extra_styles="", extra_body=""):
+        """Fill the per-document fields into the static page pieces."""
         return f"""<!DOCTYPE html>
 <html lang="ar" dir="rtl">
 <head>
@@ -650,130 +892,7 @@ class MammothConverter:
     <title>{title}</title>
     <meta name="author" content="{author}">
     {math_script}
-    <style>
-        body {{
-            font-family: 'Amiri', 'Arial', 'Tahoma', sans-serif;
-            line-height: 1.8;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-            direction: rtl;
-            text-align: right;
-            color: #333;
-        }}
-        h1, h2, h3, h4 {{
-            color: #1a1a1a;
-            margin-top: 1.5em;
-            margin-bottom: 0.5em;
-        }}
-        .title {{
-            text-align: center;
-            font-size: 2.5em;
-            margin-bottom: 0.2em;
-            color: #0066cc;
-        }}
-        .subtitle {{
-            text-align: center;
-            font-size: 1.5em;
-            color: #666;
-            margin-bottom: 1em;
-        }}
-        .author {{
-            text-align: center;
-            color: #666;
-            margin-bottom: 2em;
-            font-style: italic;
-        }}
-        img {{
-            max-width: 100%;
-            height: auto;
-            display: block;
-            margin: 1em auto;
-            border: 1px solid #ddd;
-            padding: 5px;
-            background: #fff;
-        }}
-        .caption {{
-            text-align: center;
-            font-style: italic;
-            color: #666;
-            font-size: 0.9em;
-            margin-top: -0.5em;
-            margin-bottom: 1em;
-        }}
-        .table-wrapper {{
-            overflow-x: auto;
-            margin: 1em 0;
-        }}
-        table {{
-            border-collapse: collapse;
-            width: 100%;
-            margin: 1em 0;
-            background: #fff;
-        }}
-        td, th {{
-            border: 1px solid #ddd;
-            padding: 8px;
-            text-align: right;
-        }}
-        th {{
-            background-color: #f5f5f5;
-            font-weight: bold;
-        }}
-        tr:nth-child(even) {{
-            background-color: #f9f9f9;
-        }}
-        blockquote {{
-            border-right: 4px solid #ddd;
-            margin: 1em 0;
-            padding-right: 1em;
-            color: #666;
-            font-style: italic;
-        }}
-        /* Footnotes styling */
-        .footnotes {{
-            margin-top: 3em;
-            border-top: 2px solid #ddd;
-            padding-top: 1em;
-            font-size: 0.9em;
-        }}
-        sup {{
-            font-size: 0.8em;
-            color: #0066cc;
-        }}
-        .footnote-backlink {{
-            text-decoration: none;
-            margin-right: 0.5em;
-            color: #0066cc;
-        }}
-        /* Equations */
-        .office-math-equations {{
-            margin-top: 2em;
-            padding: 1em;
-            background: #f9f9f9;
-            border-radius: 5px;
-        }}
-        .equation {{
-            margin: 0.5em 0;
-        }}
-        .display-equation {{
-            text-align: center;
-            margin: 1em 0;
-        }}
-        .MathJax {{
-            font-size: 1.1em;
-        }}
-        /* Print styles */
-        @media print {{
-            body {{
-                margin: 0;
-                padding: 10mm;
-            }}
-            .table-wrapper {{
-                overflow: visible;
-            }}
-        }}
-    </style>
+    <style>{_PAGE_STYLES}{extra_styles}</style>
 </head>
 <body>
     <h1 class="title">{title}</h1>
@@ -782,138 +901,5 @@ class MammothConverter:
     <div class="content">
         {body_html}
     </div>
-</body>
+{extra_body}</body>
 </html>"""
-
-    def _build_html_document_enhanced(self, title, author, body_html, has_equations):
-        """Enhanced HTML builder with anchor support."""
-        # MathJax script with better configuration
-        math_script = """
-    <!-- MathJax for equations -->
-    <script>
-        window.MathJax = {
-            tex: {
-                inlineMath: [['$', '$'], ['\\\\(', '\\\\)']],
-                displayMath: [['$$', '$$'], ['\\\\[', '\\\\]']],
-                processEscapes: true,
-                processEnvironments: true
-            },
-            svg: {
-                fontCache: 'global',
-                scale: 1.1
-            }
-        };
-    </script>
-    <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-svg.js"></script>
-""" if has_equations else ""
-        
-        # Enhanced CSS with anchor styles
-        anchor_styles = """
-        /* Anchor styles */
-        .equation-anchor {
-            display: inline-block;
-            width: 0;
-            height: 0;
-            visibility: hidden;
-        }
-        
-        .equation-anchor:target {
-            background: yellow;
-            padding: 5px;
-            visibility: visible;
-            width: auto;
-            height: auto;
-        }
-        
-        img[data-anchor] {
-            scroll-margin-top: 20px;
-        }
-        
-        img[data-anchor]:target {
-            border: 3px solid #0066cc !important;
-            box-shadow: 0 0 10px rgba(0, 102, 204, 0.5);
-        }
-        
-        /* Enhanced equation styles */
-        .equation {
-            position: relative;
-            margin: 0.5em 0;
-        }
-        
-        .display-math {
-            display: block;
-            text-align: center;
-            margin: 1em 0;
-            padding: 0.5em;
-            overflow-x: auto;
-        }
-        
-        .inline-math {
-            display: inline;
-            padding: 0 0.2em;
-        }
-        
-        /* Equation numbering */
-        .equation-number {
-            position: absolute;
-            right: 0;
-            color: #666;
-            font-size: 0.9em;
-        }
-        
-        /* Error handling for equations */
-        .equation-error {
-            color: red;
-            border: 1px solid red;
-            padding: 0.5em;
-            background: #ffe6e6;
-            font-family: monospace;
-        }
-"""
-        
-        # Get base HTML from original method
-        base_html = self._build_html_document(title, author, body_html, has_equations)
-        
-        # Insert enhanced styles before closing </style> tag
-        enhanced_html = base_html.replace('</style>', f'{anchor_styles}\n    </style>')
-        
-        # Add JavaScript for equation numbering and error handling
-        js_enhancements = """
-    <!-- Enhanced JavaScript for equations and anchors -->
-    <script>
-        // Handle MathJax errors gracefully
-        document.addEventListener('DOMContentLoaded', function() {
-            if (window.MathJax) {
-                window.MathJax.startup.promise.catch(function (e) {
-                    console.error('MathJax startup failed:', e);
-                });
-            }
-            
-            // Add equation numbering
-            const displayEquations = document.querySelectorAll('.display-math');
-            displayEquations.forEach((eq, index) => {
-                if (!eq.querySelector('.equation-number')) {
-                    const number = document.createElement('span');
-                    number.className = 'equation-number';
-                    number.textContent = `(${index + 1})`;
-                    eq.appendChild(number);
-                }
-            });
-            
-            // Smooth scroll to anchors
-            if (window.location.hash) {
-                const target = document.querySelector(window.location.hash);
-                if (target) {
-                    setTimeout(() => {
-                        target.scrollIntoView({ behavior: 'smooth', block: 'center' });
-                    }, 500);
-                }
-            }
-        });
-    </script>
-"""
-        
-        # Insert JavaScript before closing </body> tag
-        enhanced_html = enhanced_html.replace('</body>', f'{js_enhancements}\n</body>')
-        
-        return enhanced_html
\ No newline at end of file
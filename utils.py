@@ -29,31 +29,34 @@ def extract_text_safely(paragraph) -> str:
         # Handle any encoding issues
         return ""
 
+# Common LaTeX patterns, compiled once
+_LATEX_PATTERNS = [re.compile(pattern, re.DOTALL) for pattern in (
+    r'\$[^$]+\$',                    # Inline math $...$
+    r'\$\$[^$]+\$\$',                # Display math $$...$$
+    r'\\\[[^\]]+\\\]',               # Display \[...\]  <- FIXED
+    r'\\\([^)]+\\\)',                # Inline \(...\)   <- FIXED
+    r'\\begin\{equation\}.*?\\end\{equation\}',  # Equation environment
+    r'\\begin\{align\}.*?\\end\{align\}',        # Align environment
+)]
+_LATEX_COMMANDS = (
+    r'\\frac', r'\\sqrt', r'\\sum', r'\\int', r'\\alpha', r'\\beta',
+    r'\\gamma', r'\\delta', r'\\partial', r'\\infty', r'\\pm'
+)
+
 def detect_latex_equations(text: str) -> Tuple[bool, List[str]]:
     """Detect LaTeX equations in text."""
+    # Every pattern and command below needs a '$' or a backslash
+    if '$' not in text and '\\' not in text:
+        return False, []
+    
     equations = []
     
     # Check for common LaTeX patterns
-    latex_patterns = [
-        r'\$[^$]+\$',                    # Inline math $...$
-        r'\$\$[^$]+\$\$',                # Display math $$...$$
-        r'\\\[[^\]]+\\\]',               # Display \[...\]  <- FIXED
-        r'\\\([^)]+\\\)',                # Inline \(...\)   <- FIXED
-        r'\\begin\{equation\}.*?\\end\{equation\}',  # Equation environment
-        r'\\begin\{align\}.*?\\end\{align\}',        # Align environment
-    ]
-    
-    for pattern in latex_patterns:
-        matches = re.findall(pattern, text, re.DOTALL)
-        equations.extend(matches)
+    for pattern in _LATEX_PATTERNS:
+        equations.extend(pattern.findall(text))
     
     # Also check for common LaTeX commands
-    latex_commands = [
-        r'\\frac', r'\\sqrt', r'\\sum', r'\\int', r'\\alpha', r'\\beta',
-        r'\\gamma', r'\\delta', r'\\partial', r'\\infty', r'\\pm'
-    ]
-    
-    has_latex = any(cmd in text for cmd in latex_commands) or len(equations) > 0
+    has_latex = any(cmd in text for cmd in _LATEX_COMMANDS) or len(equations) > 0
     
     return has_latex, equations
 